@@ -0,0 +1,299 @@
+import math
+from records import read_records
+
+'''
+Streaming analytics over game records (see records.py).
+
+Every statistic is updated one record at a time and uses a fixed amount of memory
+(it only grows with the number of distinct agents), so files with millions of games
+can be aggregated without loading them.
+'''
+
+
+def wilson_interval(successes, n, z=1.96):
+    """
+    Returns the Wilson score confidence interval (low, high) for a proportion.
+    The default z gives a 95% interval.
+    """
+    if n == 0:
+        return 0.0, 0.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class LogHistogram:
+    """
+    Histogram with logarithmically spaced buckets, used for timing distributions.
+
+    Parameters:
+    - low (float): Upper bound of the first bucket; smaller values fall in it.
+    - high (float): Lower bound of the last bucket; larger values fall in it.
+    - buckets_per_decade (int): Number of buckets per power of ten.
+
+    Methods:
+    - add(value): Adds a value to the histogram.
+    - merge(other): Adds the counts of another histogram with the same layout.
+    - quantile(q): Estimates the q-quantile (0 <= q <= 1).
+    - bounds(): Returns the lower and upper bound of every bucket.
+    """
+
+    def __init__(self, low=1e-6, high=1e3, buckets_per_decade=10):
+        self.low = low
+        self.high = high
+        self.buckets_per_decade = buckets_per_decade
+        self.num_buckets = int(round(math.log10(high / low) * buckets_per_decade)) + 2
+        self.counts = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        """
+        Returns the index of the bucket the value falls in.
+        """
+        if value <= self.low:
+            return 0
+        if value >= self.high:
+            return self.num_buckets - 1
+        index = int(math.log10(value / self.low) * self.buckets_per_decade) + 1
+        return min(index, self.num_buckets - 2)
+
+    def add(self, value, count=1):
+        """
+        Adds a value to the histogram.
+        """
+        self.counts[self.bucket(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Adds the counts of another histogram with the same layout.
+        """
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def bounds(self):
+        """
+        Returns a list with the (lower, upper) bound of every bucket.
+        """
+        edges = [self.low * 10 ** (i / self.buckets_per_decade) for i in range(self.num_buckets - 1)]
+        return [(0.0, edges[0])] + list(zip(edges[:-1], edges[1:])) + [(edges[-1], float('inf'))]
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile, interpolating geometrically inside the bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, (lower, upper) in enumerate(self.bounds()):
+            count = self.counts[i]
+            if count and seen + count >= target:
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                if lower <= 0 or upper <= lower:
+                    return upper
+                fraction = (target - seen) / count
+                return lower * (upper / lower) ** fraction
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class WinRecord:
+    """
+    Win, loss and draw counts of one agent.
+    """
+
+    def __init__(self):
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def win_rate(self):
+        return self.wins / self.games if self.games else 0.0
+
+    def interval(self, z=1.96):
+        return wilson_interval(self.wins, self.games, z)
+
+
+def agent_label(player):
+    """
+    Returns the label used to group an agent of a record (its algorithm, or its type for humans).
+    """
+    return player.get("algorithm") or player.get("type")
+
+
+class GameStats:
+    """
+    GameStats aggregates game records one at a time.
+
+    Attributes:
+    - games (int): Number of records aggregated.
+    - agents (dict): WinRecord per agent label.
+    - matchups (dict): [wins of first label, wins of second label, draws] per sorted pair of labels.
+    - first_player (list): [games won by the first mover, games won by the second mover, draws].
+    - lengths (list): Number of games per number of moves (0 to 42).
+    - move_times (dict): LogHistogram of the seconds per move, per agent label.
+
+    Methods:
+    - update(record): Adds a record to the statistics.
+    - summary(): Returns the statistics as a dictionary.
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.agents = {}
+        self.matchups = {}
+        self.first_player = [0, 0, 0]
+        self.lengths = [0] * 43
+        self.move_times = {}
+
+    def update(self, record):
+        """
+        Adds a record to the statistics.
+        """
+        self.games += 1
+        labels = [agent_label(player) for player in record["players"]]
+        winner = record["winner"]
+
+        for i, label in enumerate(labels):
+            agent = self.agents.setdefault(label, WinRecord())
+            if winner is None:
+                agent.draws += 1
+            elif winner == i:
+                agent.wins += 1
+            else:
+                agent.losses += 1
+
+        pair = tuple(sorted(labels))
+        matchup = self.matchups.setdefault(pair, [0, 0, 0])
+        if winner is None:
+            matchup[2] += 1
+        elif labels[0] == labels[1]:
+            # Self-play: count it on the side of the first player of the record
+            matchup[winner] += 1
+        else:
+            matchup[pair.index(labels[winner])] += 1
+
+        first = record["first"]
+        if winner is None:
+            self.first_player[2] += 1
+        elif winner == first:
+            self.first_player[0] += 1
+        else:
+            self.first_player[1] += 1
+
+        moves = record["moves"]
+        self.lengths[min(len(moves), 42)] += 1
+
+        for ply, seconds in enumerate(record["times"]):
+            if seconds is None:
+                continue
+            label = labels[(first + ply) % 2]
+            self.move_times.setdefault(label, LogHistogram()).add(seconds)
+
+    def first_player_advantage(self):
+        """
+        Returns the fraction of decided games won by the first mover and its confidence interval.
+        """
+        decided = self.first_player[0] + self.first_player[1]
+        rate = self.first_player[0] / decided if decided else 0.0
+        return rate, wilson_interval(self.first_player[0], decided)
+
+    def mean_length(self):
+        return sum(n * count for n, count in enumerate(self.lengths)) / self.games if self.games else 0.0
+
+    def summary(self):
+        """
+        Returns the aggregated statistics as a dictionary.
+        """
+        rate, interval = self.first_player_advantage()
+        return {
+            "games": self.games,
+            "agents": {
+                label: {
+                    "games": agent.games,
+                    "wins": agent.wins,
+                    "losses": agent.losses,
+                    "draws": agent.draws,
+                    "win_rate": agent.win_rate(),
+                    "win_rate_ci": agent.interval(),
+                }
+                for label, agent in self.agents.items()
+            },
+            "matchups": {" vs ".join(pair): counts for pair, counts in self.matchups.items()},
+            "first_player": {"wins": self.first_player[0], "losses": self.first_player[1],
+                             "draws": self.first_player[2], "win_rate": rate, "win_rate_ci": interval},
+            "mean_length": self.mean_length(),
+            "move_times": {label: histogram.to_dict() for label, histogram in self.move_times.items()},
+        }
+
+
+def aggregate(filenames):
+    """
+    Aggregates the records of one or more files into a GameStats object.
+
+    Parameters:
+    - filenames: Name of a record file or a list of names.
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    stats = GameStats()
+    for filename in filenames:
+        for record in read_records(filename):
+            stats.update(record)
+    return stats
+
+
+def print_summary(stats):
+    """
+    Prints the aggregated statistics in a tabular format.
+    """
+    print(f"\nGames: {stats.games}")
+    print("{:<20} {:<8} {:<8} {:<8} {:<8} {:<20}".format("Agent", "Games", "Wins", "Losses", "Draws", "Win Rate (95% CI)"))
+    print("-" * 76)
+    for label, agent in sorted(stats.agents.items()):
+        low, high = agent.interval()
+        print("{:<20} {:<8} {:<8} {:<8} {:<8} {:.2f} [{:.2f}, {:.2f}]".format(
+            label, agent.games, agent.wins, agent.losses, agent.draws, agent.win_rate(), low, high))
+
+    rate, (low, high) = stats.first_player_advantage()
+    print(f"\nFirst player win rate (decided games): {rate:.2f} [{low:.2f}, {high:.2f}]")
+    print(f"Mean game length: {stats.mean_length():.1f} moves")
+
+    print("\n{:<20} {:<10} {:<12} {:<12} {:<12}".format("Agent", "Moves", "p50 (s)", "p95 (s)", "p99 (s)"))
+    print("-" * 66)
+    for label, histogram in sorted(stats.move_times.items()):
+        print("{:<20} {:<10} {:<12.6f} {:<12.6f} {:<12.6f}".format(
+            label, histogram.count, histogram.quantile(0.50), histogram.quantile(0.95), histogram.quantile(0.99)))
@@ -4,6 +4,10 @@ import time
 from minimax import Minimax
 import random
 from q_learning import QLearning
+from mcts import MCTS
+from seeding import derive_seed
+
+SEEDED_MCTS_ITERATIONS = 1000  # Iteration budget of seeded MCTS players, so their games can be reproduced
 """
 
 
@@ -19,10 +23,24 @@ https://www.tandfonline.com/doi/full/10.1080/08839514.2021.1934265
 class Game:
     """
     Game object that holds the state of the Connect 4 board and game values.
+
+    Every random choice of the game goes through its own generator. With a seed, each game
+    gets a seed derived from it (or the one passed to new_game), which also reseeds the
+    players, so the whole game can be reproduced.
+
+    If players are given, they are used in that order instead of prompting for them.
+    With shared_q_table (the name of a SharedQTable), Q-Learning players created by the
+    prompt attach to it instead of loading trained_q_table.pkl.
     """
 
-    def __init__(self):
+    def __init__(self, seed=None, players=None, shared_q_table=None):
         # Initialize game variables
+        self.seed = seed
+        self.shared_q_table = shared_q_table
+        self.game_seed = seed
+        self.games_played = 0
+        self.rng = random.Random(seed)
+        self.telemetry = None
         self.round = 1
         self.finished = False
         self.winner = None
@@ -30,25 +48,42 @@ class Game:
         self.players = [None, None]
         self.game_name = u"Connect four IA_LAB07"
         self.colors = ["x", "o"]
+        # Moves of the current game and the seconds spent choosing each one
+        self.moves = []
+        self.move_times = []
+        self.first_player = None
         # Randomly select the first player
-        self.turn = random.choice(self.players)
+        self.turn = self.rng.choice(self.players)
 
         # Clear the screen and display the welcome message
         os.system(['clear', 'cls'][os.name == 'nt'])
         print(u"Welcome to {0}!".format(self.game_name))
 
-        # Prompt for player types and create player objects
-        self.create_players()
+        if players is not None:
+            self.players = list(players)
+        else:
+            # Prompt for player types and create player objects
+            self.create_players()
 
-        # Randomly shuffle the players to determine who plays first
-        random.shuffle(self.players)
+            # Randomly shuffle the players to determine who plays first
+            self.rng.shuffle(self.players)
 
         # Set the first player's turn
         self.turn = self.players[0]
+        self.first_player = 0
 
         # Initialize the board
         self.board = [[' ' for _ in range(7)] for _ in range(6)]
 
+    def set_telemetry(self, telemetry):
+        """
+        Attaches a Telemetry object (see telemetry.py) to the game and its players,
+        or detaches it with None.
+        """
+        self.telemetry = telemetry
+        for player in self.players:
+            player.set_telemetry(telemetry)
+
     def create_players(self):
         """
         Prompts the user to choose player types (Human or Computer) and creates player objects.
@@ -62,20 +97,12 @@ class Game:
                 elif choice == 'c':
                     name = input(f"What is Player {i + 1}'s name? ")
                     algorithm = None
-                    qlearning = None
                     while algorithm is None:
-                        algo_choice = input(f"Select an algorithm for {name}:\n1. Minimax\n2. Alpha-Beta\n3. Q-Learning\nEnter your choice (1/2/3): ")
-                        if algo_choice == "1":
-                            algorithm = "Minimax"
-                        elif algo_choice == "2":
-                            algorithm = "Alpha-Beta"
-                            difficulty = 1  # Reduce the difficulty for alpha-beta pruning
-                        elif algo_choice == "3":
-                            algorithm = "Q-Learning"
-                            qlearning = QLearning(alpha=0.8, gamma=0.99, epsilon=1.0, epsilon_decay_rate=0.999, alpha_decay=0.001, num_actions=7)
-                        else:
+                        algo_choice = input(f"Select an algorithm for {name}:\n1. Minimax\n2. Alpha-Beta\n3. Q-Learning\n4. MCTS\nEnter your choice (1/2/3/4): ")
+                        algorithm = {"1": "Minimax", "2": "Alpha-Beta", "3": "Q-Learning", "4": "MCTS"}.get(algo_choice)
+                        if algorithm is None:
                             print("Invalid choice, please try again.")
-                    self.players[i] = AIPlayer(name, self.colors[i], difficulty if algorithm == "Alpha-Beta" else 5, algorithm, qlearning)
+                    self.players[i] = create_ai_player(name, self.colors[i], algorithm, derive_seed(self.seed, 'player', i), self.shared_q_table)
                 else:
                     print("Invalid choice, please try again.")
             print(f"{self.players[i].name} will be {self.colors[i]} using {self.players[i].algorithm if self.players[i].type == 'AI' else 'Human'} algorithm")
@@ -86,18 +113,33 @@ class Game:
         """
         if self.turn.algorithm in ["Minimax", "Alpha-Beta"]:
             legal_moves = [col for col in range(7) if self.board[0][col] == ' ']
-            move = random.choice(legal_moves)
+            move = self.rng.choice(legal_moves)
             self.board[0][move] = self.turn.color
+            self.moves.append(move)
+            self.move_times.append(None)  # Not chosen by the agent, so it has no timing
             self.switch_turn()
 
-    def new_game(self):
+    def new_game(self, seed=None):
         """
         Resets the game state for a new game.
+
+        With a seed (or, if the game was created with a seed, one derived from it for each
+        game), the game and its players are reseeded so the game can be reproduced.
         """
+        self.game_seed = seed if seed is not None else derive_seed(self.seed, 'game', self.games_played)
+        self.games_played += 1
+        if self.game_seed is not None:
+            self.rng.seed(self.game_seed)
+            for i, player in enumerate(self.players):
+                player.reseed(derive_seed(self.game_seed, 'player', i))
+
         self.round = 1
         self.finished = False
         self.winner = None
-        self.turn = random.choice(self.players)  # Randomly select the first player
+        self.turn = self.rng.choice(self.players)  # Randomly select the first player
+        self.first_player = self.players.index(self.turn)
+        self.moves = []
+        self.move_times = []
         self.board = [[' ' for _ in range(7)] for _ in range(6)]
         self.first_move_random()  # Make the first move random for Minimax and Alpha-Beta algorithms
 
@@ -127,19 +169,37 @@ class Game:
             self.finished = True  # No valid moves available, game is finished
             return
 
+        start = time.perf_counter()
         move = player.move(self.board)
+        elapsed = time.perf_counter() - start
+        if self.telemetry is not None:
+            self.telemetry.record_move(player.algorithm or player.type, self.round, elapsed)
+        if not self.play_move(move, elapsed):
+            print("Invalid move (column is full)")
+
+    def play_move(self, move, elapsed=None):
+        """
+        Drops a piece of the player in turn in the given column.
+        Returns False if the column is full.
+        """
+        player = self.turn
         for i in range(6):
             if self.board[i][move] == ' ':
                 self.board[i][move] = player.color
+                self.moves.append(move)
+                self.move_times.append(elapsed)
                 if player.algorithm == "Q-Learning":
                     reward = self.get_reward(player)
                     player.qlearning.update_q_table(tuple(map(tuple, self.board)), move, reward, tuple(map(tuple, self.board)))
                 self.switch_turn()
                 self.check_for_fours()
-                self.print_state()
-                return
-
-        print("Invalid move (column is full)")
+                if self.telemetry is not None:
+                    with self.telemetry.timer('render'):
+                        self.print_state()
+                else:
+                    self.print_state()
+                return True
+        return False
 
 
     def get_reward(self, player):
@@ -276,6 +336,19 @@ class Player:
         self.type = "Human"
         self.name = name
         self.color = color
+        self.algorithm = None
+
+    def reseed(self, seed):
+        """
+        Reseeds the random generators of the player (human players have none).
+        """
+        pass
+
+    def set_telemetry(self, telemetry):
+        """
+        Attaches a Telemetry object to the player (human players are not instrumented).
+        """
+        self.telemetry = telemetry
 
     def move(self, state):
         """
@@ -297,18 +370,46 @@ class Player:
 class AIPlayer(Player):
     """
         AIPlayer object that extends the Player class.
-        The AI algorithm is minimax with optional alpha-beta pruning.
+        The AI algorithm is minimax with optional alpha-beta pruning, Q-learning or MCTS.
+        A Q-Learning agent loads q_table_file, or attaches to the SharedQTable named
+        shared_q_table so worker processes do not each hold their own copy.
     """
-    def __init__(self, name, color, difficulty=1, algorithm=None, qlearning=None):
+    def __init__(self, name, color, difficulty=1, algorithm=None, qlearning=None, mcts=None, shared_q_table=None,
+                 q_table_file='trained_q_table.pkl'):
         self.type = "AI"
         self.name = name
         self.color = color
         self.difficulty = difficulty
         self.algorithm = algorithm
         self.minimax = Minimax([])
+        self.telemetry = None
         if algorithm == "Q-Learning":
             self.qlearning = qlearning
-            self.qlearning.load_q_table('trained_q_table.pkl')  # Load the trained Q-table
+            if shared_q_table is not None:
+                self.qlearning.attach_shared_q_table(shared_q_table)
+            elif self.qlearning.shared_q_table is None:
+                self.qlearning.load_q_table(q_table_file)  # Load the trained Q-table
+        if algorithm == "MCTS":
+            self.mcts = mcts if mcts is not None else MCTS()  # Keeps its search tree between moves
+
+    def reseed(self, seed):
+        """
+        Reseeds the random generators of the agent.
+        """
+        if self.algorithm == "Q-Learning":
+            self.qlearning.reseed(derive_seed(seed, 'qlearning'))
+        elif self.algorithm == "MCTS":
+            self.mcts.reseed(derive_seed(seed, 'mcts'))
+
+    def set_telemetry(self, telemetry):
+        """
+        Attaches a Telemetry object to the agent and its algorithm.
+        """
+        self.telemetry = telemetry
+        if self.algorithm == "Q-Learning":
+            self.qlearning.telemetry = telemetry
+        elif self.algorithm == "MCTS":
+            self.mcts.telemetry = telemetry
 
     def move(self, state):
         print(f"{self.name}'s turn. {self.name} is {self.color}")
@@ -316,13 +417,19 @@ class AIPlayer(Player):
             legal_moves = [col for col in range(7) if self.minimax.is_legal_move(col, state)]
             action = self.qlearning.choose_action(tuple(map(tuple, state)), legal_moves)
             return action
+        elif self.algorithm == "MCTS":
+            start = time.perf_counter()
+            best_move = self.mcts.search(state, self.color)
         else:
-            minimax = Minimax(state)
+            start = time.perf_counter()
+            minimax = Minimax(state, self.telemetry)
             if self.algorithm == "Minimax":
                 best_move, _ = minimax.minimax(self.difficulty, state, self.color, False)
             elif self.algorithm == "Alpha-Beta":
                 best_move, _ = minimax.minimax(self.difficulty, state, self.color, True)
-            return best_move
+        if self.telemetry is not None:
+            self.telemetry.add('search', time.perf_counter() - start)
+        return best_move
 
 class RandomPlayer(Player):
     '''
@@ -330,11 +437,50 @@ class RandomPlayer(Player):
     this class is to emulate a player and train Q-learning
 
     '''
-    def __init__(self, name, color):
+    def __init__(self, name, color, seed=None):
         self.type = "Random"
         self.name = name
         self.color = color
+        self.algorithm = None
+        self.rng = random.Random(seed)
+
+    def reseed(self, seed):
+        self.rng.seed(seed)
 
     def move(self, state):
         legal_moves = [col for col in range(7) if state[0][col] == ' ']
-        return random.choice(legal_moves)
\ No newline at end of file
+        return self.rng.choice(legal_moves)
+
+
+def create_ai_player(name, color, algorithm, seed=None, shared_q_table=None, settings=None):
+    """
+    Creates an AIPlayer for the given algorithm ("Minimax", "Alpha-Beta", "Q-Learning" or "MCTS")
+    with the settings offered by Game.create_players.
+    A Q-Learning player attaches to the SharedQTable named shared_q_table, if given, instead
+    of loading trained_q_table.pkl.
+    The MCTS player searches for one second per move, which depends on the machine speed, so
+    with a seed it gets an iteration budget instead and its games can be reproduced.
+    settings (see records.agent_settings) rebuilds the agent of a game record instead.
+    """
+    difficulty = 5
+    qlearning = None
+    mcts = None
+    q_table_file = 'trained_q_table.pkl'
+    if algorithm == "Alpha-Beta":
+        difficulty = 1  # Reduce the difficulty for alpha-beta pruning
+    elif algorithm == "Q-Learning":
+        symmetric = True
+        if settings is not None:
+            q_table_file = settings["q_table_file"] or q_table_file
+            symmetric = settings["symmetric"]
+        qlearning = QLearning(alpha=0.8, gamma=0.99, epsilon=1.0, epsilon_decay_rate=0.999, alpha_decay=0.001, num_actions=7,
+                              symmetric=symmetric, seed=derive_seed(seed, 'qlearning'))
+    elif algorithm == "MCTS":
+        if settings is not None:
+            mcts = MCTS(iterations=settings["iterations"], time_limit=settings["time_limit"], exploration=settings["exploration"],
+                        rollout_batch=settings["rollout_batch"], seed=derive_seed(seed, 'mcts'))
+        elif seed is not None:
+            mcts = MCTS(iterations=SEEDED_MCTS_ITERATIONS, seed=derive_seed(seed, 'mcts'))
+        else:
+            mcts = MCTS(time_limit=1.0)  # One second per move
+    return AIPlayer(name, color, difficulty, algorithm, qlearning, mcts, shared_q_table, q_table_file)
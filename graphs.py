@@ -1,36 +1,82 @@
+import sys
 import matplotlib.pyplot as plt
+from analytics import aggregate, print_summary
 
-# Resultados contra Alpha-Beta Pruning
-algorithms = ['Q-Learning', 'Alpha-Beta Pruning', 'Ties']
-wins_alpha_beta = [19, 55, 1]
-win_rates_alpha_beta = [0.25, 0.73, 0.01]
-
-fig, ax = plt.subplots()
-ax.bar(algorithms, wins_alpha_beta)
-ax.set_title('Resultados contra Alpha-Beta Pruning')
-ax.set_xlabel('Algoritmo')
-ax.set_ylabel('Victorias')
-
-fig2, ax2 = plt.subplots()
-ax2.bar(algorithms, win_rates_alpha_beta)
-ax2.set_title('Tasas de victoria contra Alpha-Beta Pruning')
-ax2.set_xlabel('Algoritmo')
-ax2.set_ylabel('Tasa de victoria')
-
-# Resultados contra Minimax
-wins_minimax = [42, 0, 33]
-win_rates_minimax = [0.56, 0.0, 0.44]
-
-fig3, ax3 = plt.subplots()
-ax3.bar(algorithms, wins_minimax)
-ax3.set_title('Resultados contra Minimax')
-ax3.set_xlabel('Algoritmo')
-ax3.set_ylabel('Victorias')
-
-fig4, ax4 = plt.subplots()
-ax4.bar(algorithms, win_rates_minimax)
-ax4.set_title('Tasas de victoria contra Minimax')
-ax4.set_xlabel('Algoritmo')
-ax4.set_ylabel('Tasa de victoria')
-
-plt.show()
\ No newline at end of file
+'''
+Plots the results stored in game record files (written by play.py).
+
+Usage:
+    python graphs.py [games.jsonl ...]
+'''
+
+
+def plot_stats(stats):
+    """
+    Builds the result figures from the aggregated statistics.
+    """
+    labels = sorted(stats.agents)
+    agents = [stats.agents[label] for label in labels]
+
+    # Victorias por agente
+    fig, ax = plt.subplots()
+    ax.bar(labels + ['Empates'], [agent.wins for agent in agents] + [stats.first_player[2]])
+    ax.set_title(f'Resultados ({stats.games} juegos)')
+    ax.set_xlabel('Algoritmo')
+    ax.set_ylabel('Victorias')
+
+    # Tasa de victoria con intervalo de confianza del 95%
+    rates = [agent.win_rate() for agent in agents]
+    intervals = [agent.interval() for agent in agents]
+    errors = [[rate - low for rate, (low, _) in zip(rates, intervals)],
+              [high - rate for rate, (_, high) in zip(rates, intervals)]]
+    fig2, ax2 = plt.subplots()
+    ax2.bar(labels, rates, yerr=errors, capsize=4)
+    ax2.set_title('Tasas de victoria (IC 95%)')
+    ax2.set_xlabel('Algoritmo')
+    ax2.set_ylabel('Tasa de victoria')
+    ax2.set_ylim(0, 1)
+
+    # Ventaja del primer jugador
+    fig3, ax3 = plt.subplots()
+    ax3.bar(['Primer jugador', 'Segundo jugador', 'Empates'], stats.first_player)
+    ax3.set_title('Ventaja del primer jugador')
+    ax3.set_ylabel('Juegos')
+
+    # Distribucion de la duracion de los juegos
+    fig4, ax4 = plt.subplots()
+    ax4.bar(range(len(stats.lengths)), stats.lengths)
+    ax4.set_title('Duracion de los juegos')
+    ax4.set_xlabel('Movimientos')
+    ax4.set_ylabel('Juegos')
+
+    # Distribucion del tiempo por movimiento
+    fig5, ax5 = plt.subplots()
+    for label, histogram in sorted(stats.move_times.items()):
+        used = [i for i, count in enumerate(histogram.counts) if count]
+        if not used:
+            continue
+        first, last = used[0], used[-1]
+        # The open-ended first and last buckets are drawn one decade wide
+        bounds = histogram.bounds()
+        bounds[0] = (histogram.low / 10, histogram.low)
+        bounds[-1] = (histogram.high, histogram.high * 10)
+        edges = [bounds[i][0] for i in range(first, last + 1)] + [bounds[last][1]]
+        ax5.stairs(histogram.counts[first:last + 1], edges, label=label)
+    ax5.set_xscale('log')
+    ax5.set_title('Tiempo por movimiento')
+    ax5.set_xlabel('Segundos')
+    ax5.set_ylabel('Movimientos')
+    ax5.legend()
+
+    return [fig, fig2, fig3, fig4, fig5]
+
+
+def main(filenames):
+    stats = aggregate(filenames)
+    print_summary(stats)
+    plot_stats(stats)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ['games.jsonl'])
@@ -0,0 +1,394 @@
+import time
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+'''
+Monte Carlo Tree Search with UCT selection.
+
+References:
+- [Monte Carlo tree search:](https://en.wikipedia.org/wiki/Monte_Carlo_tree_search)
+- [UCT (Kocsis & Szepesvari, 2006):](https://doi.org/10.1007/11871842_29)
+
+The tree is stored in preallocated numpy arrays indexed by node number (the children of a node
+are contiguous), and random rollouts are played in batches on a stack of boards at once.
+'''
+
+ROWS = 6
+COLUMNS = 7
+PIECES = {' ': 0, 'x': 1, 'o': 2}
+
+# Terminal status of a node
+NOT_TERMINAL = 0
+WIN = 1  # The move into the node won the game
+DRAW = 2
+
+
+def to_array(state):
+    """
+    Converts a board (list of rows, row 0 at the bottom) into an int8 array (0 empty, 1 'x', 2 'o').
+    """
+    return np.array([[PIECES[cell.lower()] for cell in row] for row in state], dtype=np.int8)
+
+
+def batch_wins(boards, piece):
+    """
+    Checks a stack of boards (n, 6, 7) for four-in-a-row of the given piece.
+    Returns a boolean array with one entry per board.
+    """
+    m = boards == piece
+    horizontal = m[:, :, :-3] & m[:, :, 1:-2] & m[:, :, 2:-1] & m[:, :, 3:]
+    vertical = m[:, :-3, :] & m[:, 1:-2, :] & m[:, 2:-1, :] & m[:, 3:, :]
+    positive = m[:, :-3, :-3] & m[:, 1:-2, 1:-2] & m[:, 2:-1, 2:-1] & m[:, 3:, 3:]
+    negative = m[:, 3:, :-3] & m[:, 2:-1, 1:-2] & m[:, 1:-2, 2:-1] & m[:, :-3, 3:]
+    return (horizontal.any(axis=(1, 2)) | vertical.any(axis=(1, 2)) |
+            positive.any(axis=(1, 2)) | negative.any(axis=(1, 2)))
+
+
+def wins_at(board, row, col, piece):
+    """
+    Checks if the piece at (row, col) of a single board is part of a four-in-a-row.
+    """
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            r, c = row + sign * d_row, col + sign * d_col
+            while 0 <= r < ROWS and 0 <= c < COLUMNS and board[r, c] == piece:
+                count += 1
+                r, c = r + sign * d_row, c + sign * d_col
+        if count >= 4:
+            return True
+    return False
+
+
+def uniform_policy(boards, heights, rng):
+    """
+    Rollout policy that picks a random legal column for every board, like RandomPlayer.
+    Returns one column per board (boards without legal moves get an arbitrary column).
+    """
+    scores = rng.random(heights.shape)
+    scores[heights >= ROWS] = -1.0
+    return scores.argmax(axis=1)
+
+
+class MCTS:
+    """
+    MCTS object that chooses moves with Monte Carlo Tree Search.
+
+    Parameters:
+    - iterations (int): Number of tree iterations per move (None for no limit).
+    - time_limit (float): Seconds per move (None for no limit). If both budgets are None,
+      1000 iterations are used.
+    - exploration (float): UCT exploration constant.
+    - rollout_batch (int): Random games played together from every new leaf.
+    - capacity (int): Maximum number of tree nodes; once full the tree stops growing.
+    - workers (int): Number of processes searching independent trees (root parallelization).
+    - rollout_policy: Function (boards, heights, rng) -> columns used for the rollouts.
+    - seed: Seed of the random generator. Searches are only reproducible with an iteration
+      budget, since a time budget depends on the machine speed.
+
+    Methods:
+    - search(state, color): Returns the best column for the given color.
+    - reset(): Discards the search tree.
+    - reseed(seed): Reseeds the random generator and discards the search tree.
+    - close(): Shuts down the worker processes.
+    """
+
+    def __init__(self, iterations=None, time_limit=None, exploration=1.4, rollout_batch=8,
+                 capacity=200000, workers=1, rollout_policy=uniform_policy, seed=None):
+        if iterations is None and time_limit is None:
+            iterations = 1000
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rollout_batch = rollout_batch
+        self.capacity = capacity
+        self.workers = workers
+        self.rollout_policy = rollout_policy
+        self.rng = np.random.default_rng(seed)
+        self.executor = None
+        self.telemetry = None  # Optional Telemetry, times the rollouts
+
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int8)
+        self.move = np.zeros(capacity, dtype=np.int8)
+        self.player = np.zeros(capacity, dtype=np.int8)  # Piece that made the move into the node
+        self.terminal = np.zeros(capacity, dtype=np.int8)
+        self.visits = np.zeros(capacity, dtype=np.float64)
+        self.value = np.zeros(capacity, dtype=np.float64)  # Reward for self.player of the node
+        self.reset()
+
+    def reset(self):
+        """
+        Discards the search tree.
+        """
+        self.size = 0
+        self.root = None
+        self.root_board = None
+
+    def reseed(self, seed):
+        """
+        Reseeds the random generator and discards the search tree, so the next searches
+        do not depend on earlier games.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def new_node(self, parent, move, player, terminal):
+        node = self.size
+        self.size += 1
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.num_children[node] = 0
+        self.move[node] = move
+        self.player[node] = player
+        self.terminal[node] = terminal
+        self.visits[node] = 0.0
+        self.value[node] = 0.0
+        return node
+
+    def set_root(self, board, piece):
+        """
+        Sets the root for the given board and piece to move, reusing the subtree of the
+        previous search when the board follows from it by the opponent's move.
+        """
+        if self.root is not None and self.root_board is not None:
+            diff = np.argwhere(board != self.root_board)
+            if len(diff) == 1 and self.root_board[tuple(diff[0])] == 0:
+                row, col = diff[0]
+                child = self.find_child(self.root, col)
+                if child is not None and self.player[child] == board[row, col]:
+                    self.compact(child)
+                    return
+        self.reset()
+        self.root = self.new_node(-1, -1, 3 - piece, NOT_TERMINAL)
+
+    def find_child(self, node, move):
+        start = self.first_child[node]
+        if start < 0:
+            return None
+        for child in range(start, start + self.num_children[node]):
+            if self.move[child] == move:
+                return child
+        return None
+
+    def compact(self, new_root):
+        """
+        Makes new_root the root, copying its subtree to the front of the arrays and dropping
+        the rest of the tree. Children stay contiguous because they are copied in BFS order.
+        """
+        order = [new_root]
+        i = 0
+        while i < len(order):
+            node = order[i]
+            start = self.first_child[node]
+            if start >= 0:
+                order.extend(range(start, start + self.num_children[node]))
+            i += 1
+        order = np.array(order, dtype=np.int32)
+        remap = np.full(self.capacity, -1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+
+        first_child = self.first_child[order]
+        parent = self.parent[order]
+        for array in (self.num_children, self.move, self.player, self.terminal, self.visits, self.value):
+            array[:len(order)] = array[order]
+        self.first_child[:len(order)] = np.where(first_child >= 0, remap[first_child], -1)
+        self.parent[:len(order)] = np.where(parent >= 0, remap[parent], -1)
+        self.parent[0] = -1
+        self.size = len(order)
+        self.root = 0
+
+    def select_child(self, node):
+        """
+        Returns the child of the node with the highest UCT score (unvisited children first).
+        """
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return start + unvisited[self.rng.integers(len(unvisited))]
+        scores = self.value[start:end] / visits + self.exploration * np.sqrt(math.log(self.visits[node]) / visits)
+        return start + int(scores.argmax())
+
+    def expand(self, node, board, heights):
+        """
+        Creates the children of a node for every legal column. Returns False if the tree is full.
+        """
+        legal = np.flatnonzero(heights < ROWS)
+        if self.size + len(legal) > self.capacity:
+            return False
+        piece = 3 - self.player[node]
+        full = heights.sum() + 1 == ROWS * COLUMNS
+        self.first_child[node] = self.size
+        self.num_children[node] = len(legal)
+        for col in legal:
+            row = heights[col]
+            board[row, col] = piece
+            if wins_at(board, row, col, piece):
+                terminal = WIN
+            elif full:
+                terminal = DRAW
+            else:
+                terminal = NOT_TERMINAL
+            board[row, col] = 0
+            self.new_node(node, col, piece, terminal)
+        return True
+
+    def rollout(self, board, heights, piece):
+        """
+        Plays rollout_batch random games from the board at once.
+        Returns the number of wins of piece 1, wins of piece 2 and draws.
+        """
+        batch = self.rollout_batch
+        boards = np.repeat(board[None], batch, axis=0)
+        heights = np.repeat(heights[None], batch, axis=0)
+        winners = np.zeros(batch, dtype=np.int8)
+        active = np.ones(batch, dtype=bool)
+        index = np.arange(batch)
+
+        while True:
+            active &= (heights < ROWS).any(axis=1)
+            playing = index[active]
+            if not len(playing):
+                break
+            cols = self.rollout_policy(boards[playing], heights[playing], self.rng)
+            rows = heights[playing, cols]
+            boards[playing, rows, cols] = piece
+            heights[playing, cols] += 1
+            won = playing[batch_wins(boards[playing], piece)]
+            winners[won] = piece
+            active[won] = False
+            piece = 3 - piece
+
+        return np.count_nonzero(winners == 1), np.count_nonzero(winners == 2), np.count_nonzero(winners == 0)
+
+    def iterate(self, root_board, root_heights):
+        """
+        Runs one selection, expansion, simulation and backpropagation step.
+        """
+        board = root_board.copy()
+        heights = root_heights.copy()
+        node = self.root
+
+        # Selection
+        while self.first_child[node] >= 0 and self.terminal[node] == NOT_TERMINAL:
+            node = self.select_child(node)
+            col = self.move[node]
+            board[heights[col], col] = self.player[node]
+            heights[col] += 1
+
+        # Expansion
+        if self.terminal[node] == NOT_TERMINAL and self.expand(node, board, heights):
+            node = self.select_child(node)
+            col = self.move[node]
+            board[heights[col], col] = self.player[node]
+            heights[col] += 1
+
+        # Simulation
+        batch = self.rollout_batch
+        if self.terminal[node] == WIN:
+            wins = [0, batch, 0] if self.player[node] == 1 else [0, 0, batch]
+            draws = 0
+        elif self.terminal[node] == DRAW:
+            wins = [0, 0, 0]
+            draws = batch
+        else:
+            if self.telemetry is not None:
+                start = time.perf_counter()
+            wins_1, wins_2, draws = self.rollout(board, heights, 3 - self.player[node])
+            if self.telemetry is not None:
+                self.telemetry.add('rollout', time.perf_counter() - start)
+            wins = [0, wins_1, wins_2]
+
+        # Backpropagation
+        while node >= 0:
+            self.visits[node] += batch
+            self.value[node] += wins[self.player[node]] + 0.5 * draws
+            node = self.parent[node]
+
+    def run(self, board, piece):
+        """
+        Grows the tree for the given board within the iteration and time budgets.
+        """
+        self.set_root(board, piece)
+        heights = np.count_nonzero(board, axis=0).astype(np.int64)
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        iteration = 0
+        while self.iterations is None or iteration < self.iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self.iterate(board, heights)
+            iteration += 1
+
+    def root_visits(self):
+        """
+        Returns the moves of the root children and their visit counts.
+        """
+        start = self.first_child[self.root]
+        if start < 0:
+            return [], []
+        end = start + self.num_children[self.root]
+        return self.move[start:end].tolist(), self.visits[start:end].tolist()
+
+    def search(self, state, color):
+        """
+        Returns the column with the most visits after searching the given state for color.
+        """
+        board = to_array(state)
+        piece = PIECES[color.lower()]
+
+        if self.workers > 1:
+            moves, visits = self.parallel_search(board, piece)
+        else:
+            self.run(board, piece)
+            moves, visits = self.root_visits()
+
+        if not moves:
+            legal = np.flatnonzero(np.count_nonzero(board, axis=0) < ROWS)
+            return int(self.rng.choice(legal))
+        best_move = moves[int(np.argmax(visits))]
+
+        if self.workers == 1:
+            # Keep the subtree of the chosen move for the next search
+            child = self.find_child(self.root, best_move)
+            self.compact(child)
+            self.root_board = board.copy()
+            self.root_board[np.count_nonzero(board[:, best_move]), best_move] = piece
+        return int(best_move)
+
+    def parallel_search(self, board, piece):
+        """
+        Searches independent trees in worker processes and adds up their root visit counts.
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+        seeds = self.rng.integers(2 ** 32, size=self.workers)
+        params = (self.iterations, self.time_limit, self.exploration, self.rollout_batch,
+                  self.capacity, self.rollout_policy)
+        futures = [self.executor.submit(search_worker, board, piece, params, int(seed)) for seed in seeds]
+        totals = {}
+        for future in futures:
+            for move, visits in zip(*future.result()):
+                totals[move] = totals.get(move, 0.0) + visits
+        moves = sorted(totals)
+        return moves, [totals[move] for move in moves]
+
+    def close(self):
+        """
+        Shuts down the worker processes used by root parallelization.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def search_worker(board, piece, params, seed):
+    """
+    Runs a single-process search in a worker and returns its root visit counts.
+    """
+    iterations, time_limit, exploration, rollout_batch, capacity, rollout_policy = params
+    mcts = MCTS(iterations, time_limit, exploration, rollout_batch, capacity, 1, rollout_policy, seed)
+    mcts.run(board, piece)
+    return mcts.root_visits()
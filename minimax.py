@@ -1,4 +1,6 @@
 import random
+import time
+from symmetry import canonical, unique_moves
 '''
 We use this references for our algorithms
 - [MiniMax pseudo-code:](https://es.wikipedia.org/wiki/Minimax)  
@@ -10,9 +12,12 @@ class Minimax:
     Minimax object that takes a current Connect 4 board state and performs the minimax algorithm with alpha-beta pruning.
     """
 
-    def __init__(self, board):
+    def __init__(self, board, telemetry=None):
         self.board = [row[:] for row in board]
         self.colors = ["x", "o"]
+        self.telemetry = telemetry  # Optional Telemetry, times the evaluations
+        # Values of already searched positions, shared between a position and its mirror
+        self.cache = {}
 
     # def random_move(self, state, curr_player):
     #     """
@@ -42,13 +47,19 @@ class Minimax:
         if depth == 0 or not legal_moves or self.game_is_over(state):
             return None, self.evaluate(state, curr_player)
 
+        # On a symmetric board the mirrored moves have the same value, so only one of each pair is searched
+        legal_moves = unique_moves(state, legal_moves)
+
         # Iterate over all legal moves
         # if not use_alpha_beta:
         #     print(f'{curr_player} using minimax algorithm')
 
         for move in legal_moves:
             new_state = self.make_move(state, move, curr_player)
-            _, value = self.minimax(depth - 1, new_state, opp_player, use_alpha_beta, -beta, -alpha)
+            if use_alpha_beta:
+                _, value = self.minimax(depth - 1, new_state, opp_player, use_alpha_beta, -beta, -alpha)
+            else:
+                value = self.cached_minimax(depth - 1, new_state, opp_player)
             
             if value > best_value:
                 best_value = value
@@ -62,6 +73,16 @@ class Minimax:
 
         return best_move, best_value
 
+    def cached_minimax(self, depth, state, curr_player):
+        """
+        Returns the minimax value (without alpha-beta pruning) of the given state, reusing the
+        value of the state or its mirror if it was already searched at the same depth.
+        Alpha-beta values depend on the search window, so they are not cached.
+        """
+        key = (canonical(state)[0], curr_player, depth)
+        if key not in self.cache:
+            _, self.cache[key] = self.minimax(depth, state, curr_player, False)
+        return self.cache[key]
 
     def is_legal_move(self, column, state):
         """
@@ -93,6 +114,8 @@ class Minimax:
         Evaluates the board state for the given color using a heuristic function.
         The heuristic is based on the number of streaks of different lengths.
         """
+        if self.telemetry is not None:
+            start = time.perf_counter()
         opp_color = self.colors[1] if color == self.colors[0] else self.colors[0]
         my_fours = self.check_for_streak(state, color, 4)
         my_threes = self.check_for_streak(state, color, 3)
@@ -100,9 +123,13 @@ class Minimax:
         opp_fours = self.check_for_streak(state, opp_color, 4)
 
         if opp_fours > 0:
-            return -100000
+            value = -100000
         else:
-            return my_fours * 100000 + my_threes * 100 + my_twos
+            value = my_fours * 100000 + my_threes * 100 + my_twos
+
+        if self.telemetry is not None:
+            self.telemetry.add('eval', time.perf_counter() - start)
+        return value
 
     def check_for_streak(self, state, color, streak):
         """
@@ -1,7 +1,14 @@
+import time
+import random
 from connect4 import *
+from records import GameRecorder
+from collections import deque
+from teacher import MinimaxTeacher, TeacherPool, UPPER
+from seeding import derive_seed
+from telemetry import Telemetry
 from tqdm import tqdm
 
-def train_qlearning_agent(game, num_episodes):
+def train_qlearning_agent(game, num_episodes, seed=None, telemetry=None):
     
     """
     we are gonna use tqdm to show the progress of our training
@@ -16,6 +23,8 @@ def train_qlearning_agent(game, num_episodes):
     Args:
     game: A Connect4 game instance.
     num_episodes: Number of complete games to play against the RandomPlayer opponent.
+    seed: Base seed of the training (each episode gets a seed derived from it).
+    telemetry: Optional Telemetry collecting per-ply latencies of the training games.
     """
 
     print("Training Q-Learning Agent...")
@@ -27,9 +36,11 @@ def train_qlearning_agent(game, num_episodes):
         return
 
     player1.qlearning.episode = 0  # Reset episode count before training
+    if telemetry is not None:
+        game.set_telemetry(telemetry)
 
     for episode in tqdm(range(num_episodes), desc="Training Progress"):
-        game.new_game()
+        game.new_game(derive_seed(seed, 'episode', episode))
         while not game.finished:
             state = tuple(map(tuple, game.board))
             legal_moves = [col for col in range(7) if game.board[0][col] == ' ']
@@ -48,17 +59,148 @@ def train_qlearning_agent(game, num_episodes):
     print("We overwrite the new trained Q-table with the old one.")
 
 
-def play_matches(game, num_games):
+def train_qlearning_with_teacher(game, num_episodes, teacher_depth=2, bootstrap=True, curriculum=False, teacher_alpha=0.5, seed=None, telemetry=None, teacher_workers=1):
+    """
+    Trains the Q-Learning agent of player 1 with the help of a shallow Minimax search
+    (MinimaxTeacher), without rendering the board.
+
+    With bootstrap, the positions where the agent moved are collected during each game and,
+    at the end of it, the Q-values of every legal move of those positions are moved towards
+    the teacher's search values in one batch (TreeStrap style). The moves of a position share
+    one alpha-beta search, so the moves that cannot be the best one only get an upper bound,
+    which is used as a target only when the Q-value is above it. Repeated and mirrored
+    positions are searched once and the teacher caches its searches and evaluations across games.
+    With teacher_workers > 1 the batches are searched by a TeacherPool while the next games are
+    played, and the targets of a game are applied teacher_workers games later.
+
+    With curriculum, the opponent is a separate teacher searching at a depth that grows from 1 to
+    teacher_depth over the training (its tables never answer with deeper searches, so its
+    strength only depends on the depth); otherwise the opponent plays random legal moves.
+
+    Args:
+    game: A Connect4 game instance whose player 1 uses Q-Learning.
+    num_episodes: Number of games to play.
+    teacher_depth: Search depth of the teacher.
+    bootstrap: Use the teacher's values as Q-value targets.
+    curriculum: Use the teacher as the opponent.
+    teacher_alpha: Step size towards the teacher's targets.
+    seed: Base seed of the training (each episode gets a seed derived from it).
+    telemetry: Optional Telemetry timing the Q-table lookups and the teacher searches
+    (with a TeacherPool, the time spent waiting for its results).
+    teacher_workers: Number of worker processes searching the bootstrap batches.
+    """
+    print("Training Q-Learning Agent with a Minimax teacher...")
+    player1 = game.players[0]
+
+    if player1.algorithm != "Q-Learning":
+        print("Player 1 is not using the Q-Learning algorithm. Training aborted.")
+        return
+
+    qlearning = player1.qlearning
+    qlearning.episode = 0  # Reset episode count before training
+    qlearning.telemetry = telemetry
+    teacher = MinimaxTeacher(teacher_depth)
+    opponent = MinimaxTeacher(teacher_depth, reuse_deeper=False) if curriculum else None
+    color = player1.color
+    opp_color = teacher.opponent(color)
+    minimax = teacher.minimax
+    pool = TeacherPool(teacher_workers, depth=teacher_depth) if bootstrap and teacher_workers > 1 else None
+    pending = deque()
+
+    def apply_targets(targets):
+        for state, action, target, flag in targets:
+            if flag == UPPER and qlearning.get_q_value(state, action) <= target:
+                continue  # Already consistent with the bound
+            qlearning.update_q_value(state, action, target, teacher_alpha)
+
+    def collect_targets():
+        start = time.perf_counter()
+        targets = pool.collect(pending.popleft())
+        if telemetry is not None:
+            telemetry.add('teacher', time.perf_counter() - start)
+        apply_targets(targets)
+
+    for episode in tqdm(range(num_episodes), desc="Training Progress"):
+        episode_seed = derive_seed(seed, 'episode', episode)
+        rng = random.Random(episode_seed)
+        if episode_seed is not None:
+            qlearning.reseed(derive_seed(episode_seed, 'qlearning'))
+        board = [[' ' for _ in range(7)] for _ in range(6)]
+        turn = rng.choice([color, opp_color])
+        opp_depth = 1 + episode * teacher_depth // num_episodes
+        visited = []
+        last_state, last_action = None, None
+
+        while True:
+            legal_moves = [col for col in range(7) if minimax.is_legal_move(col, board)]
+            if not legal_moves:
+                if last_state is not None:
+                    qlearning.train(last_state, last_action, 0, tuple(map(tuple, board)))
+                break
+
+            if turn == color:
+                state = tuple(map(tuple, board))
+                action = qlearning.choose_action(state, legal_moves)
+                board = minimax.make_move(board, action, color)
+                visited.append((state, legal_moves))
+                won = minimax.game_is_over(board)
+                qlearning.train(state, action, 100 if won else 0, tuple(map(tuple, board)))
+                last_state, last_action = state, action
+            else:
+                if curriculum:
+                    start = time.perf_counter()
+                    move = opponent.best_move(board, opp_color, opp_depth)
+                    if telemetry is not None:
+                        telemetry.add('teacher', time.perf_counter() - start)
+                else:
+                    move = rng.choice(legal_moves)
+                board = minimax.make_move(board, move, opp_color)
+                won = minimax.game_is_over(board)
+                if won and last_state is not None:
+                    qlearning.train(last_state, last_action, -100, tuple(map(tuple, board)))
+
+            if won:
+                break
+            turn = opp_color if turn == color else color
+
+        if bootstrap and pool is not None:
+            pending.append(pool.submit(visited, color))
+            while len(pending) > teacher_workers:
+                collect_targets()
+        elif bootstrap:
+            start = time.perf_counter()
+            targets = teacher.targets(visited, color)
+            if telemetry is not None:
+                telemetry.add('teacher', time.perf_counter() - start)
+            apply_targets(targets)
+
+    if pool is not None:
+        while pending:
+            collect_targets()
+        pool.close()
+
+    qlearning.save_q_table('trained_q_table.pkl')
+    stats = pool if pool is not None else teacher
+    print(f"Training completed. Teacher cache: {stats.hits} hits, {stats.misses} searches, "
+          f"{stats.static_hits} cached evaluations, {stats.evaluations} evaluations.")
+
+
+def play_matches(game, num_games, recorder=None, seed=None, worker=0, telemetry=None):
     """
     Play a number of matches between two players, keeping track of wins for each.
 
-    Loads trained Q-tables if players are using Q-learning. 
+    Loads trained Q-tables if players are using Q-learning (unless they are
+    attached to a shared Q-table). 
     Plays full games, printing the final board each time.
     After all games, prints the win counts for each player and ties.
 
     Args:
     game: Game to play matches in 
     num_games: Number of games to play
+    recorder: Optional GameRecorder where every finished game is appended
+    seed: Base seed of the matches (each game gets a seed derived from it, the worker and its number)
+    worker: Number of the worker playing these matches when they are split across processes
+    telemetry: Optional Telemetry collecting per-ply latencies and time per category
 
     Returns:
     None
@@ -67,24 +209,30 @@ def play_matches(game, num_games):
     player1 = game.players[0]
     player2 = game.players[1]
 
-    if player1.algorithm == "Q-Learning":
+    if player1.algorithm == "Q-Learning" and player1.qlearning.shared_q_table is None:
         print("Loading Q-table for player 1...")
         player1.qlearning.load_q_table('trained_q_table.pkl')
-    elif player2.algorithm == "Q-Learning":
+    elif player2.algorithm == "Q-Learning" and player2.qlearning.shared_q_table is None:
         print("Loading Q-table for player 2...")
         player2.qlearning.load_q_table('trained_q_table.pkl')
 
+    if telemetry is not None:
+        game.set_telemetry(telemetry)
+
     win_counts = [0, 0, 0]  # [player1 wins, player2 wins, ties]
 
     for i in range(num_games):
         print(f"Game {i+1}/{num_games}")
-        game.new_game()
+        game.new_game(derive_seed(seed, 'match', worker, i))
         
         while not game.finished:
             game.next_move()
 
         game.print_state()
 
+        if recorder is not None:
+            recorder.write(game)
+
         if game.winner is None:
             win_counts[2] += 1
         elif game.winner == player1:
@@ -92,6 +240,9 @@ def play_matches(game, num_games):
         else:
             win_counts[1] += 1
 
+    if telemetry is not None:
+        telemetry.print_summary()
+
     print_stats(player1, player2, win_counts)
 
 def main():
@@ -100,19 +251,25 @@ def main():
     num_training_episodes = 30000
     train_qlearning_agent(training_game, num_training_episodes)
 
-    # Play phase mini-max
-    game = Game()
-    game.print_state()
-    num_games = 75
-    play_matches(game, num_games)
+    # Every game is appended to games.jsonl, plot the results with graphs.py
+    telemetry = Telemetry()
+    with GameRecorder('games.jsonl') as recorder:
+        # Play phase mini-max
+        game = Game()
+        game.print_state()
+        num_games = 75
+        play_matches(game, num_games, recorder, telemetry=telemetry)
+
+        input("Press Enter to continue to the next set of matches...")
 
-    input("Press Enter to continue to the next set of matches...")
+        # Play phase alfa-beta pruning
+        game = Game()
+        game.print_state()
+        num_games = 75
+        play_matches(game, num_games, recorder, telemetry=telemetry)
 
-    # Play phase alfa-beta pruning
-    game = Game()
-    game.print_state()
-    num_games = 75
-    play_matches(game, num_games)
+    telemetry.to_json('telemetry.json')
+    telemetry.to_prometheus('telemetry.prom')
 
 def print_stats(player1, player2, win_counts):
     """
@@ -0,0 +1,69 @@
+import os
+import sys
+import heapq
+import argparse
+from symmetry import canonical_q_table
+from q_learning import read_q_table_file, write_q_table_file
+
+'''
+Offline pruning and compaction of a saved Q-table (e.g. trained_q_table.pkl).
+
+Usage:
+    python prune_q_table.py trained_q_table.pkl [-o pruned.pkl] [--threshold T] [--max-entries N] [--symmetric]
+
+By default the table is only shrunk without changing any Q-value lookup QLearning makes: entries
+for illegal actions (full columns, which are never looked up) and entries equal to 0.0 (what
+QLearning returns for a missing entry) are dropped. --threshold also drops small values,
+--max-entries keeps only the largest absolute values, and --symmetric converts a table trained
+without symmetry to the canonical keys used by QLearning(symmetric=True), averaging mirrored
+duplicates with symmetry.canonical_q_table, the same conversion QLearning.load_q_table makes.
+Keys are converted before anything is dropped, so the pruned table reads the same values as
+the converted one. The output records whether its
+keys are canonical, so QLearning.load_q_table reads it with the right key format.
+'''
+
+
+def prune_q_table(q_table, threshold=0.0, max_entries=None, symmetric=False):
+    """
+    Returns a pruned copy of a Q-table.
+
+    Args:
+    q_table: Dictionary mapping (state, action) to Q-values.
+    threshold: Entries with an absolute Q-value less than or equal to it are dropped.
+    max_entries: Maximum number of entries kept (the ones with the largest absolute Q-values).
+    symmetric: Convert the keys to the canonical orientation of the board (see symmetry.py).
+    """
+    if symmetric:
+        # Convert before dropping entries, so 0.0 entries still count in the averages
+        q_table = canonical_q_table(q_table)
+    pruned = {(state, action): q_value for (state, action), q_value in q_table.items()
+              if state[-1][action] == ' ' and abs(q_value) > threshold}
+
+    if max_entries is not None and len(pruned) > max_entries:
+        pruned = dict(heapq.nlargest(max_entries, pruned.items(), key=lambda item: abs(item[1])))
+    return pruned
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Prune and compact a saved Q-table.")
+    parser.add_argument("filename", help="Q-table file to prune")
+    parser.add_argument("-o", "--output", help="output file (default: overwrite the input file)")
+    parser.add_argument("--threshold", type=float, default=0.0, help="drop entries with |Q| <= threshold")
+    parser.add_argument("--max-entries", type=int, default=None, help="keep at most this many entries")
+    parser.add_argument("--symmetric", action="store_true", help="merge mirrored positions under canonical keys")
+    options = parser.parse_args(args)
+
+    input_size = os.path.getsize(options.filename)
+    q_table, symmetric = read_q_table_file(options.filename)
+    # Canonical keys are left as they are
+    pruned = prune_q_table(q_table, options.threshold, options.max_entries, options.symmetric and not symmetric)
+
+    output = options.output or options.filename
+    write_q_table_file(output, pruned, symmetric or options.symmetric)
+
+    print(f"Entries: {len(q_table)} -> {len(pruned)}")
+    print(f"File size: {input_size} -> {os.path.getsize(output)} bytes")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,7 +1,152 @@
-import numpy as np
 import random
 import math
+import time
+import heapq
 import pickle
+import hashlib
+from collections import OrderedDict
+from symmetry import canonical_action, canonical_q_table, expand_q_table
+from shared_q_table import SharedQTable
+
+EVICTION_POLICIES = ('lru', 'visits', 'near_zero')
+
+
+def read_q_table_file(filename):
+    """
+    Reads a Q-table file written by write_q_table_file.
+
+    Files saved before the key format was recorded hold a plain dictionary, which is read as
+    raw (state, action) keys. Canonical keys are not changed by canonical_q_table, so this
+    is also safe for plain files that already hold canonical keys.
+
+    Returns:
+    - q_table: Dictionary mapping (state, action) to Q-values.
+    - symmetric: Whether the keys are canonical (see symmetry.py).
+    """
+    with open(filename, 'rb') as file:
+        data = pickle.load(file)
+    if isinstance(data, dict) and data.keys() == {"symmetric", "q_table"}:
+        return data["q_table"], data["symmetric"]
+    return data, False
+
+
+def q_table_file_hash(filename):
+    """
+    Returns the SHA-256 hex digest of a Q-table file, to check later that the same table is used.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_q_table_file(filename, q_table, symmetric):
+    """
+    Writes a Q-table dictionary to a file, recording whether its keys are canonical.
+    """
+    with open(filename, 'wb') as file:
+        pickle.dump({"symmetric": symmetric, "q_table": q_table}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class BoundedQTable:
+    """
+    BoundedQTable is a Q-table with a maximum number of entries. When a new entry does not fit,
+    entries are evicted according to the eviction policy.
+
+    Parameters:
+    - max_size (int): Maximum number of entries.
+    - eviction (str): Eviction policy:
+        - 'lru': Evicts the least recently read or written entry.
+        - 'visits': Evicts the entries updated the fewest times.
+        - 'near_zero': Evicts the entries whose Q-value is closest to 0.0 (the value of a missing entry).
+    - evict_fraction (float): Fraction of max_size evicted at once by the 'visits' and 'near_zero'
+      policies, which have to scan the table to find their victims.
+
+    Attributes:
+    - entries (OrderedDict): Q-values by (state, action), from least to most recently used.
+    - visits (dict): Number of updates of every entry.
+    - evictions (int): Number of entries evicted so far.
+
+    Methods:
+    - get(key, default): Returns the Q-value of a key, or default if it is not in the table.
+    - items(): Returns the (key, Q-value) pairs.
+    - update(q_table): Adds the entries of another Q-table.
+    - to_dict(): Returns the entries as a plain dictionary.
+    """
+
+    def __init__(self, max_size, eviction='lru', evict_fraction=0.05):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction!r}, expected one of {EVICTION_POLICIES}")
+        self.max_size = max_size
+        self.eviction = eviction
+        self.evict_count = max(1, int(max_size * evict_fraction))
+        self.entries = OrderedDict()
+        self.visits = {}
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        q_value = self.entries.get(key)
+        if q_value is None:
+            return default
+        if self.eviction == 'lru':
+            self.entries.move_to_end(key)
+        return q_value
+
+    def __getitem__(self, key):
+        q_value = self.get(key)
+        if q_value is None:
+            raise KeyError(key)
+        return q_value
+
+    def __setitem__(self, key, q_value):
+        is_new = key not in self.entries
+        self.entries[key] = q_value
+        self.entries.move_to_end(key)
+        self.visits[key] = self.visits.get(key, 0) + 1
+        if is_new and len(self.entries) > self.max_size:
+            self.evict(key)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def evict(self, new_key):
+        """
+        Evicts entries until the table fits in max_size, never evicting the entry just added.
+        """
+        if self.eviction == 'lru':
+            victims = []
+            for key in self.entries:
+                if len(self.entries) - len(victims) <= self.max_size:
+                    break
+                victims.append(key)
+        else:
+            if self.eviction == 'visits':
+                rank = self.visits.__getitem__
+            else:
+                rank = lambda key: abs(self.entries[key])
+            candidates = (key for key in self.entries if key != new_key)
+            count = max(self.evict_count, len(self.entries) - self.max_size)
+            victims = heapq.nsmallest(count, candidates, key=rank)
+
+        for key in victims:
+            del self.entries[key]
+            del self.visits[key]
+        self.evictions += len(victims)
+
+    def items(self):
+        return self.entries.items()
+
+    def update(self, q_table):
+        for key, q_value in q_table.items():
+            self[key] = q_value
+
+    def to_dict(self):
+        return dict(self.entries)
+
 
 class QLearning:
     """
@@ -14,6 +159,10 @@ class QLearning:
     - epsilon_decay_rate (float): Epsilon decay rate.
     - alpha_decay (float): Learning rate decay.
     - num_actions (int): Number of possible actions.
+    - symmetric (bool): Store mirrored positions under the same key (see symmetry.py).
+    - seed: Seed of the random generator used for exploration and tie-breaking.
+    - max_size (int): Maximum number of Q-table entries (None for no limit, see BoundedQTable).
+    - eviction (str): Eviction policy of a bounded Q-table ('lru', 'visits' or 'near_zero').
 
     Attributes:
     - alpha (float): Learning rate.
@@ -22,28 +171,56 @@ class QLearning:
     - epsilon_decay_rate (float): Epsilon decay rate.
     - alpha_decay (float): Learning rate decay.
     - num_actions (int): Number of possible actions.
-    - q_table (dict): Q-table to store Q-values for state-action pairs.
+    - symmetric (bool): Whether Q-values are stored under the canonical orientation of the board.
+    - q_table (dict or BoundedQTable): Q-table to store Q-values for state-action pairs.
+    - shared_q_table (SharedQTable): Optional read-only table in shared memory, consulted after q_table.
     - episode (int): Current episode number.
+    - rng (random.Random): Random generator of the agent.
+    - telemetry (Telemetry): Optional telemetry that times the Q-table lookups.
+    - q_table_file (str): File the Q-table was loaded from (None if it was not loaded).
+    - q_table_hash (str): SHA-256 of that file (None if it was not found).
 
     Methods:
     - train(state, action, reward, next_state): Updates the Q-table based on the given transition.
+    - q_key(state, action): Returns the Q-table key of the given state-action pair.
     - get_q_value(state, action): Returns the Q-value for the given state-action pair.
     - choose_action(state, legal_moves): Chooses an action based on the current state and legal moves.
     - update_q_table(state, action, reward, next_state): Updates the Q-value in the Q-table based on the given transition.
+    - update_q_value(state, action, target, alpha): Moves the Q-value towards a target value.
     - reset_episode(): Resets the episode counter.
+    - reseed(seed): Reseeds the random generator.
+    - new_q_table(): Returns an empty Q-table, bounded if max_size is set.
     - save_q_table(filename): Saves the Q-table to a file.
     - load_q_table(filename): Loads the Q-table from a file.
+    - share_q_table(name): Copies the Q-table into shared memory for other processes.
+    - attach_shared_q_table(name): Uses a Q-table shared by another process.
     """
 
-    def __init__(self, alpha, gamma, epsilon, epsilon_decay_rate, alpha_decay, num_actions):
+    def __init__(self, alpha, gamma, epsilon, epsilon_decay_rate, alpha_decay, num_actions, symmetric=True, seed=None, max_size=None, eviction='lru'):
         self.alpha = alpha  # Learning rate
         self.gamma = gamma  # Discount factor
         self.epsilon = epsilon  # Initial exploration rate
         self.epsilon_decay_rate = epsilon_decay_rate  # Epsilon decay rate
         self.alpha_decay = alpha_decay  # Learning rate decay
         self.num_actions = num_actions
-        self.q_table = {}
+        self.symmetric = symmetric  # A transition also teaches the mirrored position
+        self.max_size = max_size
+        self.eviction = eviction
+        self.q_table = self.new_q_table()
+        self.shared_q_table = None
         self.episode = 0
+        self.rng = random.Random(seed)
+        self.telemetry = None  # Optional Telemetry, times the Q-table lookups of choose_action
+        self.q_table_file = None
+        self.q_table_hash = None
+
+    def new_q_table(self):
+        """
+        Returns an empty Q-table, bounded if max_size is set.
+        """
+        if self.max_size is None:
+            return {}
+        return BoundedQTable(self.max_size, self.eviction)
 
     def train(self, state, action, reward, next_state):
         """
@@ -57,9 +234,27 @@ class QLearning:
         """
         self.update_q_table(state, action, reward, next_state)
 
+    def q_key(self, state, action):
+        """
+        Returns the Q-table key of the given state-action pair. With symmetric enabled, a state
+        and its mirror image share the key, with the action mapped to the canonical orientation.
+
+        Parameters:
+        - state: Board state.
+        - action: Action taken in the state.
+
+        Returns:
+        - key: Tuple (state, action).
+        """
+        if self.symmetric:
+            return canonical_action(state, action)
+        return (state, action)
+
     def get_q_value(self, state, action):
         """
-        Returns the Q-value for the given state-action pair.
+        Returns the Q-value for the given state-action pair, or 0.0 if it has none.
+        Lookups never insert into the Q-table. Entries of q_table take precedence
+        over the shared Q-table, so updates made by this process are seen.
 
         Parameters:
         - state: Current state.
@@ -68,9 +263,11 @@ class QLearning:
         Returns:
         - q_value: Q-value for the given state-action pair.
         """
-        if (state, action) not in self.q_table:
-            self.q_table[(state, action)] = 0.0
-        return self.q_table[(state, action)]
+        key = self.q_key(state, action)
+        q_value = self.q_table.get(key)
+        if q_value is None:
+            q_value = self.shared_q_table.get(key, 0.0) if self.shared_q_table is not None else 0.0
+        return q_value
 
     def choose_action(self, state, legal_moves):
         """
@@ -86,21 +283,26 @@ class QLearning:
         self.episode += 1
         epsilon = self.epsilon * math.pow(self.epsilon_decay_rate, self.episode)
 
-        if np.random.uniform() < epsilon:
+        if self.rng.random() < epsilon:
             # Explore: choose a random action from legal moves
-            action = random.choice(legal_moves)
+            action = self.rng.choice(legal_moves)
         else:
             # Exploit: choose the action with the highest Q-value
+            if self.telemetry is not None:
+                start = time.perf_counter()
             q_values = [self.get_q_value(state, a) for a in legal_moves]
+            if self.telemetry is not None:
+                self.telemetry.add('q_lookup', time.perf_counter() - start)
             max_q_value = max(q_values)
             best_actions = [a for a, q in zip(legal_moves, q_values) if q == max_q_value]
-            action = random.choice(best_actions)
+            action = self.rng.choice(best_actions)
 
         return action
 
     def update_q_table(self, state, action, reward, next_state):
         """
         Updates the Q-value in the Q-table based on the given transition.
+        Only the legal actions of next_state are considered for its maximum Q-value.
 
         Parameters:
         - state: Current state.
@@ -109,10 +311,27 @@ class QLearning:
         - next_state: Next state after taking the action.
         """
         old_q_value = self.get_q_value(state, action)
-        next_max_q_value = max([self.get_q_value(next_state, a) for a in range(self.num_actions)])
+        next_legal_moves = [a for a in range(self.num_actions) if next_state[-1][a] == ' ']
+        next_max_q_value = max([self.get_q_value(next_state, a) for a in next_legal_moves], default=0.0)
         self.alpha = self.alpha / (1 + self.episode * self.alpha_decay)
         new_q_value = (1 - self.alpha) * old_q_value + self.alpha * (reward + self.gamma * next_max_q_value)
-        self.q_table[(state, action)] = new_q_value
+        self.q_table[self.q_key(state, action)] = new_q_value
+
+    def update_q_value(self, state, action, target, alpha=None):
+        """
+        Moves the Q-value of a state-action pair towards a target value, e.g. one supplied
+        by a search (see teacher.py) instead of the next state of a transition.
+
+        Parameters:
+        - state: Current state.
+        - action: Action taken in the current state.
+        - target: Target Q-value.
+        - alpha: Step size (the current learning rate if None).
+        """
+        if alpha is None:
+            alpha = self.alpha
+        old_q_value = self.get_q_value(state, action)
+        self.q_table[self.q_key(state, action)] = (1 - alpha) * old_q_value + alpha * target
 
     def reset_episode(self):
         """
@@ -120,26 +339,83 @@ class QLearning:
         """
         self.episode = 0
 
+    def reseed(self, seed):
+        """
+        Reseeds the random generator.
+
+        Parameters:
+        - seed: New seed.
+        """
+        self.rng.seed(seed)
+
     def save_q_table(self, filename):
         """
-        Saves the Q-table to a file.
+        Saves the Q-table to a file (always as a plain dictionary), together with
+        whether its keys are canonical.
 
         Parameters:
         - filename: Name of the file to save the Q-table.
         """
-        with open(filename, 'wb') as file:
-            pickle.dump(self.q_table, file)
+        q_table = self.q_table.to_dict() if isinstance(self.q_table, BoundedQTable) else self.q_table
+        write_q_table_file(filename, q_table, self.symmetric)
 
     def load_q_table(self, filename):
         """
-        Loads the Q-table from a file.
+        Loads the Q-table from a file. If the keys of the file do not match the symmetric
+        setting of the agent, they are converted (raw keys are merged under canonical keys,
+        canonical keys are expanded to both orientations). With max_size set, only up to
+        max_size entries are kept (the ones with the largest absolute Q-values); use
+        prune_q_table.py to shrink the file itself.
 
         Parameters:
         - filename: Name of the file to load the Q-table from.
         """
         print ("Rock and LOAD !!!")
+        self.q_table_file = filename
+        self.q_table_hash = None
         try:
-            with open(filename, 'rb') as file:
-                self.q_table = pickle.load(file)
+            q_table, symmetric = read_q_table_file(filename)
+            self.q_table_hash = q_table_file_hash(filename)
+            if symmetric != self.symmetric:
+                print(f"Converting the Q-table keys to the {'canonical' if self.symmetric else 'raw'} format.")
+                q_table = canonical_q_table(q_table) if self.symmetric else expand_q_table(q_table)
+            if self.max_size is not None:
+                if len(q_table) > self.max_size:
+                    q_table = dict(heapq.nlargest(self.max_size, q_table.items(), key=lambda item: abs(item[1])))
+                self.q_table = self.new_q_table()
+                self.q_table.update(q_table)
+            else:
+                self.q_table = q_table
         except FileNotFoundError:
-            print("Q-table file not found. Starting with an empty Q-table.")
\ No newline at end of file
+            print("Q-table file not found. Starting with an empty Q-table.")
+
+    def share_q_table(self, name=None):
+        """
+        Copies the Q-table into shared memory so match workers can attach to it instead of
+        loading their own copy. The caller owns the returned table and must unlink it when
+        the workers are done.
+
+        Parameters:
+        - name: Name of the shared memory block (a random one is chosen if None).
+
+        Returns:
+        - table: SharedQTable; workers attach with attach_shared_q_table(table.name).
+        """
+        return SharedQTable.create(self.q_table, name, symmetric=self.symmetric)
+
+    def attach_shared_q_table(self, name):
+        """
+        Attaches to a Q-table shared by another process. Lookups fall back to it when a key is
+        not in q_table, and updates made by this process only go to q_table.
+        Raises ValueError if the keys of the shared table are not in the format of this agent
+        (see symmetric); converting them would need a private copy of the table.
+
+        Parameters:
+        - name: Name of the shared memory block.
+        """
+        table = SharedQTable.attach(name)
+        if table.symmetric != self.symmetric:
+            table.close()
+            raise ValueError(f"Shared Q-table {name} has {'canonical' if table.symmetric else 'raw'} keys, "
+                             f"but this agent uses {'canonical' if self.symmetric else 'raw'} keys (symmetric={self.symmetric})")
+        self.shared_q_table = table
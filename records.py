@@ -0,0 +1,161 @@
+import gzip
+import json
+import time
+
+'''
+Game records are stored as JSON Lines: one compact JSON object per finished game,
+appended at the end of the file. Files ending in ".gz" are transparently compressed.
+
+Record fields:
+- version: Record format version.
+- time: Unix time when the game was written.
+- seed: Seed used for the game (None if the game was not seeded).
+- players: Agents in the order of Game.players (name, type, algorithm, color, difficulty and
+  the settings needed to rebuild the agent, see agent_settings).
+- first: Index in players of the player that made the first move.
+- moves: Columns played, in order.
+- times: Seconds spent choosing each move (aligned with moves, None for random opening moves).
+- winner: Index in players of the winner, or None for a draw.
+- rounds: Final round counter of the game.
+'''
+
+RECORD_VERSION = 2
+
+
+def open_record_file(filename, mode):
+    """
+    Opens a record file in text mode, using gzip when the filename ends in ".gz".
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't', encoding='utf-8')
+    return open(filename, mode, encoding='utf-8')
+
+
+def agent_settings(player):
+    """
+    Returns the settings of an AI player that its algorithm depends on (empty for the others):
+    - MCTS: iterations, time_limit, rollout_batch and exploration.
+    - Q-Learning: the Q-table file and its SHA-256 (None if it was not loaded from a file,
+      e.g. when attached to a shared table), and whether its keys are canonical.
+    """
+    algorithm = getattr(player, 'algorithm', None)
+    if algorithm == "MCTS":
+        mcts = player.mcts
+        return {
+            "iterations": mcts.iterations,
+            "time_limit": mcts.time_limit,
+            "rollout_batch": mcts.rollout_batch,
+            "exploration": mcts.exploration,
+        }
+    if algorithm == "Q-Learning":
+        qlearning = player.qlearning
+        return {
+            "q_table_file": qlearning.q_table_file,
+            "q_table_hash": qlearning.q_table_hash,
+            "symmetric": qlearning.symmetric,
+        }
+    return {}
+
+
+def describe_player(player):
+    """
+    Returns a dictionary describing the given player for a game record.
+    """
+    return {
+        "name": player.name,
+        "type": player.type,
+        "algorithm": getattr(player, 'algorithm', None),
+        "color": player.color,
+        "difficulty": getattr(player, 'difficulty', None),
+        "settings": agent_settings(player),
+    }
+
+
+def game_record(game):
+    """
+    Builds the record of a finished game.
+    """
+    winner = None
+    if game.winner is not None:
+        winner = game.players.index(game.winner)
+
+    return {
+        "version": RECORD_VERSION,
+        "time": time.time(),
+        "seed": getattr(game, 'game_seed', None),
+        "players": [describe_player(player) for player in game.players],
+        "first": game.first_player,
+        "moves": list(game.moves),
+        "times": [None if t is None else round(t, 6) for t in game.move_times],
+        "winner": winner,
+        "rounds": game.round,
+    }
+
+
+class GameRecorder:
+    """
+    GameRecorder appends finished games to a record file.
+
+    Parameters:
+    - filename (str): File to append the records to.
+
+    Methods:
+    - write(game): Appends the record of a finished game.
+    - close(): Closes the record file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open_record_file(filename, 'a')
+        self.count = 0
+
+    def write(self, game):
+        """
+        Appends the record of a finished game to the file.
+
+        Parameters:
+        - game: Finished Game instance.
+        """
+        self.write_record(game_record(game))
+
+    def write_record(self, record):
+        """
+        Appends an already built record to the file.
+
+        Parameters:
+        - record: Record dictionary.
+        """
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        """
+        Closes the record file.
+        """
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_records(filename):
+    """
+    Yields the records stored in a file one at a time, so files of any size can be read
+    in constant memory. A truncated last line (e.g. from an interrupted run) is skipped.
+
+    Parameters:
+    - filename: Name of the record file.
+    """
+    with open_record_file(filename, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -0,0 +1,139 @@
+import sys
+import time
+from connect4 import Game, Player, create_ai_player
+from records import read_records
+
+'''
+Replays a recorded game (see records.py) move by move.
+
+Usage:
+    python replay.py games.jsonl [game number] [--rerun] [--speed N]
+
+By default the recorded moves are shown one at a time, waiting the time each one took
+(divided by the speed; 0 shows them without waiting). With --rerun the agents are rebuilt
+from the record, reseeded with the game seed and asked for every move again, to check that
+they still play the same moves and to compare how long they take.
+
+The agents are rebuilt with the settings stored in the record (MCTS budgets, Q-table file).
+Reruns are only exact for seeded games whose agents do not depend on the clock (an MCTS player
+with a time limit) and, for Q-Learning, with the same Q-table file as the recorded game, which
+is checked against the hash in the record.
+'''
+
+
+def players_from_record(record, rerun=False):
+    """
+    Builds the players of a record, in the order of the record.
+    Without rerun (or for human players) the players only hold the name and color.
+    """
+    players = []
+    for description in record["players"]:
+        if rerun and description["type"] == "AI":
+            settings = description.get("settings")  # Not stored by version 1 records
+            player = create_ai_player(description["name"], description["color"], description["algorithm"], settings=settings)
+            if description["difficulty"] is not None:
+                player.difficulty = description["difficulty"]
+            if settings is None:
+                print(f"The record has no settings for {player.name}, using the default ones.")
+            elif player.algorithm == "MCTS" and settings["time_limit"] is not None:
+                print(f"{player.name} searched with a time limit, so the rerun may play other moves.")
+            elif player.algorithm == "Q-Learning" and player.qlearning.q_table_hash != settings["q_table_hash"]:
+                print(f"The Q-table of {player.name} ({player.qlearning.q_table_file}) is not the one of the record.")
+        else:
+            player = Player(description["name"], description["color"])
+        players.append(player)
+    return players
+
+
+def replay(record, rerun=False, speed=1.0):
+    """
+    Replays a recorded game move by move.
+
+    Args:
+    record: Game record.
+    rerun: Ask the agents for every move again and compare with the recorded moves.
+    speed: Playback speed; the recorded time of each move is divided by it (0 for no waiting).
+
+    Returns:
+    A list with (ply, recorded move, rerun move, recorded seconds, rerun seconds) per move;
+    the rerun values are None for moves that were not rerun.
+    """
+    players = players_from_record(record, rerun)
+    game = Game(players=players)
+    if rerun:
+        if record["seed"] is None:
+            print("The game was not seeded, so the agents cannot reproduce it.")
+        # Reseed the agents as new_game did for the recorded game
+        game.new_game(record["seed"])
+
+    game.round = 1
+    game.finished = False
+    game.winner = None
+    game.board = [[' ' for _ in range(7)] for _ in range(6)]
+    game.moves = []
+    game.move_times = []
+    game.first_player = record["first"]
+    game.turn = game.players[record["first"]]
+    game.print_state()
+
+    results = []
+    for ply, (move, seconds) in enumerate(zip(record["moves"], record["times"])):
+        player = game.turn
+        rerun_move = None
+        rerun_seconds = None
+        if rerun and seconds is not None and player.type == "AI":
+            start = time.perf_counter()
+            rerun_move = player.move(game.board)
+            rerun_seconds = time.perf_counter() - start
+        elif speed and seconds is not None:
+            time.sleep(seconds / speed)
+
+        game.play_move(move, seconds)
+        results.append((ply, move, rerun_move, seconds, rerun_seconds))
+
+        line = f"Move {ply + 1}: {player.name} plays {move + 1}"
+        if seconds is not None:
+            line += f" ({seconds:.4f}s"
+            if rerun_seconds is not None:
+                line += f", rerun {rerun_seconds:.4f}s"
+            line += ")"
+        if rerun_move is not None and rerun_move != move:
+            line += f" - rerun played {rerun_move + 1} instead"
+        print(line)
+
+    return results
+
+
+def print_rerun_summary(results):
+    """
+    Prints how many rerun moves matched the record and the total time of both runs.
+    """
+    rerun = [result for result in results if result[2] is not None]
+    if not rerun:
+        return
+    matches = sum(1 for _, move, rerun_move, _, _ in rerun if move == rerun_move)
+    recorded_time = sum(result[3] for result in rerun)
+    rerun_time = sum(result[4] for result in rerun)
+    print(f"\nRerun moves matching the record: {matches}/{len(rerun)}")
+    print(f"Time of the rerun moves: recorded {recorded_time:.4f}s, rerun {rerun_time:.4f}s")
+
+
+def main(args):
+    rerun = "--rerun" in args
+    speed = 1.0
+    if "--speed" in args:
+        speed = float(args[args.index("--speed") + 1])
+        args = args[:args.index("--speed")] + args[args.index("--speed") + 2:]
+    args = [arg for arg in args if arg != "--rerun"]
+    filename = args[0] if args else 'games.jsonl'
+    number = int(args[1]) if len(args) > 1 else 1
+
+    for i, record in enumerate(read_records(filename), start=1):
+        if i == number:
+            print_rerun_summary(replay(record, rerun, speed))
+            return
+    print(f"{filename} has fewer than {number} games.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
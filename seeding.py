@@ -0,0 +1,21 @@
+import hashlib
+
+'''
+Seed derivation for reproducible runs.
+
+A run is started from a single base seed, and every game, agent, trainer and worker gets its
+own seed derived from the base seed and a few keys describing it (e.g. derive_seed(seed, 'match', 3)).
+Derived seeds do not depend on the order in which they are requested, so results stay the same
+when the work is split across processes.
+'''
+
+
+def derive_seed(seed, *keys):
+    """
+    Derives a 64-bit seed from a base seed and any number of keys.
+    Returns None if the base seed is None (unseeded runs stay unseeded).
+    """
+    if seed is None:
+        return None
+    text = "/".join(str(part) for part in (seed,) + keys)
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
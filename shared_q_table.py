@@ -0,0 +1,252 @@
+import os
+import sys
+import math
+import subprocess
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+'''
+Read-only Q-table stored in shared memory, so several match workers can use the same
+trained table without each one holding its own unpickled copy.
+
+The table is an open-addressing hash table with linear probing. Every (state, action) key
+is packed into two 64-bit words: each of the 42 cells takes 2 bits (' ' = 0, 'x' = 1, 'o' = 2)
+and the action takes 3 bits. The highest bit of the first word marks a used slot.
+
+Memory layout (8-byte words):
+- header: magic, capacity, number of entries, whether the keys are canonical (see symmetry.py)
+- keys: 2 words per slot
+- values: 1 double per slot
+
+Running this module checks that spawned workers can attach to a table and that the creator
+can still unlink it afterwards without resource tracker errors:
+    python shared_q_table.py
+'''
+
+MAGIC = 0x43345154  # "C4QT"
+HEADER_WORDS = 4
+USED = 1 << 63
+MASK64 = (1 << 64) - 1
+CELL_CODES = {' ': 0, 'x': 1, 'o': 2}
+
+
+def encode_key(state, action):
+    """
+    Packs a (state, action) pair into two 64-bit words (high, low).
+    """
+    code = 0
+    for row in state:
+        for cell in row:
+            code = (code << 2) | CELL_CODES[cell.lower()]
+    code = (code << 3) | action
+    return (code >> 64) | USED, code & MASK64
+
+
+def slot_hash(high, low):
+    """
+    Mixes the two words of a key into a 64-bit hash (splitmix64 finalizer).
+    """
+    z = (low ^ (high * 0x9E3779B97F4A7C15)) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def open_shared_memory(name):
+    """
+    Attaches to an existing shared memory block without registering it for cleanup in this
+    process, so a worker exiting does not destroy the table.
+    Before Python 3.13 SharedMemory has no track argument and always registers POSIX blocks
+    with the resource tracker, which spawned workers share with the process that created the
+    block. Unregistering afterwards would also drop the creator's registration, so the
+    registration is suppressed while attaching instead.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedQTable:
+    """
+    SharedQTable is a read-only mapping from (state, action) to Q-values in shared memory.
+
+    Use SharedQTable.create in the parent process and SharedQTable.attach(name) in each worker.
+    Lookups never modify the table.
+
+    Attributes:
+    - name (str): Name of the shared memory block, passed to workers to attach.
+    - capacity (int): Number of slots of the hash table.
+    - symmetric (bool): Whether the keys are canonical, as in QLearning(symmetric=True).
+
+    Methods:
+    - create(q_table, name, load_factor, symmetric): Builds a shared table from a Q-table dictionary.
+    - attach(name): Attaches to a shared table created by another process.
+    - get(key, default): Returns the Q-value of a (state, action) key, or default if missing.
+    - close(): Detaches from the shared memory.
+    - unlink(): Destroys the shared memory (only the creator should call it).
+    """
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.name = shm.name
+        header = shm.buf[:HEADER_WORDS * 8].cast('Q')
+        if header[0] != MAGIC:
+            header.release()
+            raise ValueError(f"Shared memory block {shm.name} does not hold a Q-table")
+        self.capacity = header[1]
+        self.size = header[2]
+        self.symmetric = bool(header[3])
+        header.release()
+        keys_end = (HEADER_WORDS + 2 * self.capacity) * 8
+        self.keys = shm.buf[HEADER_WORDS * 8:keys_end].cast('Q')
+        self.values = shm.buf[keys_end:keys_end + self.capacity * 8].cast('d')
+
+    @classmethod
+    def create(cls, q_table, name=None, load_factor=0.5, symmetric=False):
+        """
+        Builds a shared table holding the entries of a Q-table dictionary.
+
+        Parameters:
+        - q_table: Dictionary mapping (state, action) to Q-values.
+        - name: Name of the shared memory block (a random one is chosen if None).
+        - load_factor: Maximum fraction of used slots.
+        - symmetric: Whether the keys of the Q-table are canonical, recorded for the workers.
+
+        Returns:
+        - table: SharedQTable owning the shared memory.
+        """
+        capacity = 1 << max(3, math.ceil(math.log2(max(1, len(q_table)) / load_factor)))
+        size = (HEADER_WORDS + 3 * capacity) * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = shm.buf[:HEADER_WORDS * 8].cast('Q')
+        keys_end = (HEADER_WORDS + 2 * capacity) * 8
+        keys = shm.buf[HEADER_WORDS * 8:keys_end].cast('Q')
+        values = shm.buf[keys_end:keys_end + capacity * 8].cast('d')
+        mask = capacity - 1
+
+        for (state, action), q_value in q_table.items():
+            high, low = encode_key(state, action)
+            slot = slot_hash(high, low) & mask
+            while keys[2 * slot] and (keys[2 * slot] != high or keys[2 * slot + 1] != low):
+                slot = (slot + 1) & mask
+            keys[2 * slot] = high
+            keys[2 * slot + 1] = low
+            values[slot] = q_value
+
+        header[0] = MAGIC
+        header[1] = capacity
+        header[2] = len(q_table)
+        header[3] = int(symmetric)
+        for view in (header, keys, values):
+            view.release()
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attaches to a shared table created by another process. The creating process should
+        keep using the table returned by create, since attaching does not register the
+        block for cleanup.
+
+        Parameters:
+        - name: Name of the shared memory block.
+        """
+        return cls(open_shared_memory(name))
+
+    def find(self, key):
+        """
+        Returns the slot holding the given key, or None if it is not in the table.
+        """
+        high, low = encode_key(*key)
+        keys = self.keys
+        mask = self.capacity - 1
+        slot = slot_hash(high, low) & mask
+        while keys[2 * slot]:
+            if keys[2 * slot] == high and keys[2 * slot + 1] == low:
+                return slot
+            slot = (slot + 1) & mask
+        return None
+
+    def get(self, key, default=0.0):
+        """
+        Returns the Q-value of a (state, action) key, or default if it is not in the table.
+        """
+        slot = self.find(key)
+        return default if slot is None else self.values[slot]
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        """
+        Detaches this process from the shared memory.
+        """
+        self.keys.release()
+        self.values.release()
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Destroys the shared memory block. Only the process that created it should call this,
+        after every worker has closed it.
+        """
+        self.shm.unlink()
+
+
+EMPTY_BOARD = ((' ',) * 7,) * 6
+
+
+def read_in_worker(name, queue):
+    """
+    Attaches to a shared table in a worker, reads one entry and detaches.
+    """
+    table = SharedQTable.attach(name)
+    queue.put(table.get((EMPTY_BOARD, 3)))
+    table.close()
+
+
+def spawned_workers_scenario(workers=2):
+    """
+    Creates a table, lets spawned workers read it and unlinks it once they exit.
+    Returns the values the workers read.
+    """
+    table = SharedQTable.create({(EMPTY_BOARD, 3): 1.5})
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    processes = [context.Process(target=read_in_worker, args=(table.name, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    values = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    table.close()
+    table.unlink()
+    return values
+
+
+def check_spawned_workers():
+    """
+    Runs spawned_workers_scenario in a new interpreter, so its resource tracker ends with it,
+    and checks the values read and that nothing was reported on stderr.
+    """
+    code = "import shared_q_table; print(shared_q_table.spawned_workers_scenario())"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0 or result.stderr or result.stdout.strip() != "[1.5, 1.5]":
+        raise RuntimeError(f"Shared Q-table check failed:\n{result.stdout}{result.stderr}")
+    print("Spawned workers read the shared table and the creator unlinked it cleanly.")
+
+
+if __name__ == "__main__":
+    check_spawned_workers()
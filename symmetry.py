@@ -0,0 +1,91 @@
+'''
+Connect Four is left-right symmetric: a position and its mirror image have the same value,
+and playing column c in one is equivalent to playing column 6 - c in the other.
+
+These helpers map positions to a canonical orientation (the smaller of the board and its
+mirror, comparing them as tuples of rows) so both orientations share the same key.
+'''
+
+NUM_COLUMNS = 7
+
+
+def mirror_move(column):
+    """
+    Returns the column equivalent to the given one in the mirrored board.
+    """
+    return NUM_COLUMNS - 1 - column
+
+
+def mirror_board(state):
+    """
+    Returns the mirror image of the board as a tuple of tuples.
+    """
+    return tuple(tuple(row[::-1]) for row in state)
+
+
+def is_symmetric(state):
+    """
+    Checks if the board is equal to its own mirror image.
+    """
+    return all(tuple(row) == tuple(row[::-1]) for row in state)
+
+
+def canonical(state):
+    """
+    Returns the canonical orientation of the board as a tuple of tuples, and a boolean
+    indicating if it is the mirrored one.
+    """
+    board = tuple(map(tuple, state))
+    mirrored = mirror_board(board)
+    if mirrored < board:
+        return mirrored, True
+    return board, False
+
+
+def canonical_action(state, action):
+    """
+    Returns the canonical board and the action mapped to the canonical orientation.
+    """
+    board, mirrored = canonical(state)
+    return board, mirror_move(action) if mirrored else action
+
+
+def unique_moves(state, moves):
+    """
+    Drops the moves that are mirror images of an earlier move when the board is symmetric,
+    since they lead to mirrored positions with the same value.
+    """
+    if not is_symmetric(state):
+        return moves
+    return [move for move in moves if move <= mirror_move(move)]
+
+
+def canonical_q_table(q_table):
+    """
+    Returns a copy of a Q-table with raw (state, action) keys converted to canonical keys,
+    averaging the values of mirrored duplicates.
+    """
+    canonical_table = {}
+    counts = {}
+    for (state, action), q_value in q_table.items():
+        key = canonical_action(state, action)
+        if key in canonical_table:
+            # Running average of the values of mirrored duplicates
+            counts[key] += 1
+            canonical_table[key] += (q_value - canonical_table[key]) / counts[key]
+        else:
+            canonical_table[key] = q_value
+            counts[key] = 1
+    return canonical_table
+
+
+def expand_q_table(q_table):
+    """
+    Returns a copy of a Q-table with canonical keys that also holds the mirror image of every
+    entry, so it can be read with raw (state, action) keys.
+    """
+    expanded = {}
+    for (state, action), q_value in q_table.items():
+        expanded[(state, action)] = q_value
+        expanded[(mirror_board(state), mirror_move(action))] = q_value
+    return expanded
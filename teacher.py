@@ -0,0 +1,361 @@
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from minimax import Minimax
+from symmetry import canonical, is_symmetric, mirror_move
+'''
+Shallow Minimax search used to teach the Q-learning agent.
+
+The teacher runs a negamax search with alpha-beta pruning on top of the Minimax heuristic
+(evaluate() of the player to move minus evaluate() of the opponent, so values are zero-sum).
+Two bounded tables keyed by the canonical board (see symmetry.py) avoid repeated work:
+- The static table holds the heuristic of every evaluated board, whatever the depth it was
+  reached at. The heuristic is computed on bitboards of both colors, giving the same value
+  as the two Minimax.evaluate calls.
+- The transposition table holds the searched value of interior nodes with its depth and
+  bound type. An entry searched deeper also answers a shallower query, unless reuse_deeper
+  is off (e.g. for an opponent whose strength must be set by the depth alone).
+
+All the moves of a position are searched by one root negamax sharing the alpha-beta window,
+so the moves that cannot be the best one only get an upper bound. As in TreeStrap(alpha-beta),
+a bound is only used as a target when the current Q-value is on the wrong side of it.
+
+TeacherPool runs the searches of whole batches in worker processes, each one with its own
+teacher and tables, so training does not wait for them.
+
+References:
+- [Negamax:](https://en.wikipedia.org/wiki/Negamax)
+- [TreeStrap (Veness et al., 2009):](https://papers.nips.cc/paper/3722-bootstrapping-from-game-tree-search)
+'''
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+MOVE_ORDER = (3, 2, 4, 1, 5, 0, 6)  # Center columns first, so alpha-beta cuts earlier
+
+# Bitboards: bit 8 * row + column is set for the cells of a color. Bit 7 of every row stays
+# empty so streaks do not wrap around, and each shift below steps along one direction.
+DIRECTIONS = (1, 8, 9, 7)  # Horizontal, vertical, positive slope, negative slope
+FIRST_BITS = str.maketrans({'x': '1', 'o': '0', ' ': '0', '|': '0'})
+SECOND_BITS = str.maketrans({'x': '0', 'o': '1', ' ': '0', '|': '0'})
+
+
+def bitboards(board):
+    """
+    Returns the bitboards of the first ('x') and second ('o') colors.
+    """
+    cells = '|'.join(''.join(row) for row in board)[::-1]
+    return int(cells.translate(FIRST_BITS), 2), int(cells.translate(SECOND_BITS), 2)
+
+
+def streak_counts(bits):
+    """
+    Returns the number of streaks of 2, 3 and 4 in a bitboard, counted as
+    Minimax.check_for_streak does: a maximal run of length n holds n - k + 1 streaks of k.
+    """
+    twos = threes = fours = 0
+    for shift in DIRECTIONS:
+        pairs = bits & (bits >> shift)
+        triples = pairs & (bits >> 2 * shift)
+        twos += pairs.bit_count()
+        threes += triples.bit_count()
+        fours += (triples & (bits >> 3 * shift)).bit_count()
+    return twos, threes, fours
+
+
+def play(board, column, color):
+    """
+    Returns the board (a tuple of rows) after dropping a piece of color in the given column.
+    """
+    for i, row in enumerate(board):
+        if row[column] == ' ':
+            return board[:i] + (row[:column] + (color,) + row[column + 1:],) + board[i + 1:]
+
+
+class MinimaxTeacher:
+    """
+    MinimaxTeacher supplies Q-value targets and moves from a shallow Minimax search.
+
+    Parameters:
+    - depth (int): Default search depth.
+    - cache_size (int): Maximum number of positions kept in the transposition table.
+    - static_cache_size (int): Maximum number of boards whose heuristic is kept.
+    - value_scale (float): Heuristic value mapped to about 76% of the reward scale (tanh(1)).
+    - reward (float): Reward of a win, the targets are in [-reward, reward].
+    - reuse_deeper (bool): Let transposition table entries searched deeper answer shallower queries.
+
+    Methods:
+    - static(state): Heuristic value of the state for the first color and whether the game is over.
+    - value(state, color, depth): Negamax value of the state for color (the player to move).
+    - search(state, color, depth, legal_moves): (move, value, flag) of every move from one root search.
+    - best_move(state, color, depth): Best column for color.
+    - action_targets(state, legal_moves, color): (action, target, flag) of every legal move.
+    - targets(batch, color): Q-value targets of a batch of (state, legal_moves) pairs.
+    """
+
+    def __init__(self, depth=2, cache_size=200000, static_cache_size=200000, value_scale=1000.0, reward=100, reuse_deeper=True):
+        self.depth = depth
+        self.reuse_deeper = reuse_deeper
+        self.cache_size = cache_size
+        self.static_cache_size = static_cache_size
+        self.value_scale = value_scale
+        self.reward = reward
+        self.minimax = Minimax([])
+        self.colors = self.minimax.colors
+        self.cache = OrderedDict()
+        self.static_cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.static_hits = 0
+        self.evaluations = 0
+
+    def opponent(self, color):
+        return self.colors[1] if color == self.colors[0] else self.colors[0]
+
+    def legal_moves(self, state):
+        return [col for col in MOVE_ORDER if state[-1][col] == ' ']
+
+    def static(self, board):
+        """
+        Returns the heuristic value of a canonical board for the first color (the Minimax
+        evaluate() of the first color minus the one of the second) and whether the game is over.
+        """
+        entry = self.static_cache.get(board)
+        if entry is not None:
+            self.static_cache.move_to_end(board)
+            self.static_hits += 1
+            return entry
+        self.evaluations += 1
+
+        first_bits, second_bits = bitboards(board)
+        first_twos, first_threes, first_fours = streak_counts(first_bits)
+        second_twos, second_threes, second_fours = streak_counts(second_bits)
+        first_value = -100000 if second_fours else first_fours * 100000 + first_threes * 100 + first_twos
+        second_value = -100000 if first_fours else second_fours * 100000 + second_threes * 100 + second_twos
+        entry = (first_value - second_value, first_fours > 0 or second_fours > 0)
+
+        self.static_cache[board] = entry
+        if len(self.static_cache) > self.static_cache_size:
+            self.static_cache.popitem(last=False)
+        return entry
+
+    def heuristic(self, state, color):
+        """
+        Zero-sum version of Minimax.evaluate from the point of view of color.
+        """
+        value, _ = self.static(canonical(state)[0])
+        return value if color == self.colors[0] else -value
+
+    def value(self, state, color, depth=None, alpha=-float('inf'), beta=float('inf')):
+        """
+        Returns the negamax value of the state for color, the player to move.
+        """
+        if depth is None:
+            depth = self.depth
+        board = canonical(state)[0]
+        key = (board, color) if self.reuse_deeper else (board, color, depth)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            entry_depth, value, flag = entry
+            if entry_depth >= depth and (flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha)):
+                self.hits += 1
+                return value
+
+        static_value, over = self.static(board)
+        legal_moves = self.legal_moves(board)
+        if depth == 0 or over or not legal_moves:
+            return static_value if color == self.colors[0] else -static_value
+        self.misses += 1
+
+        original_alpha = alpha
+        opp_color = self.opponent(color)
+        value = -float('inf')
+        if is_symmetric(board):
+            legal_moves = [move for move in legal_moves if move <= mirror_move(move)]
+        for move in legal_moves:
+            child = play(board, move, color)
+            value = max(value, -self.value(child, opp_color, depth - 1, -beta, -alpha))
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if value <= original_alpha:
+            flag = UPPER
+        elif value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.store(key, depth, value, flag)
+        return value
+
+    def store(self, key, depth, value, flag):
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] > depth:
+            # Keep the deeper search, it answers this depth too
+            self.cache.move_to_end(key)
+            return
+        self.cache[key] = (depth, value, flag)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def search(self, state, color, depth=None, legal_moves=None):
+        """
+        Searches every legal move of color with one negamax sharing the alpha-beta window
+        (the move itself counts as the first ply).
+
+        Returns:
+        A list of (move, value, flag) in the order of legal_moves. The best move has an EXACT
+        value; a move that cannot beat an earlier one has an UPPER bound.
+        """
+        if depth is None:
+            depth = self.depth
+        state = tuple(map(tuple, state))
+        if legal_moves is None:
+            legal_moves = self.legal_moves(state)
+        symmetric = is_symmetric(state)
+        opp_color = self.opponent(color)
+        alpha = -float('inf')
+        results = {}
+        for move in sorted(legal_moves, key=MOVE_ORDER.index):
+            if symmetric and move > mirror_move(move):
+                continue  # Same value as its mirror move
+            child = play(state, move, color)
+            value = -self.value(child, opp_color, max(depth - 1, 0), -float('inf'), -alpha)
+            results[move] = (value, EXACT if value > alpha else UPPER)
+            alpha = max(alpha, value)
+        return [(move,) + results[move if move in results else mirror_move(move)] for move in legal_moves]
+
+    def best_move(self, state, color, depth=None):
+        """
+        Returns the column with the highest negamax value for color.
+        """
+        best_move = None
+        best_value = -float('inf')
+        for move, value, flag in self.search(state, color, depth):
+            if flag == EXACT and value > best_value:
+                best_move, best_value = move, value
+        return best_move
+
+    def to_target(self, value):
+        """
+        Maps a heuristic value to the reward scale of the Q-table.
+        """
+        return self.reward * math.tanh(value / self.value_scale)
+
+    def action_targets(self, state, legal_moves, color):
+        """
+        Returns a list of (action, target, flag) with the Q-value target of every legal move
+        of color, searched to the teacher depth. The flag is EXACT, or UPPER when the target
+        is only an upper bound of the value of the move.
+        """
+        return [(move, self.to_target(value), flag)
+                for move, value, flag in self.search(state, color, self.depth, legal_moves)]
+
+    def targets(self, batch, color):
+        """
+        Returns a list of (state, action, target, flag) for a batch of (state, legal_moves) pairs.
+        Repeated and mirrored states of the batch are searched only once.
+
+        Parameters:
+        - batch: List of (state, legal_moves) where color is to move.
+        - color: Color of the learning agent.
+        """
+        results = []
+        seen = {}
+        for state, legal_moves in batch:
+            key, mirrored = canonical(state)
+            if key not in seen:
+                targets = self.action_targets(state, legal_moves, color)
+                seen[key] = (mirrored, {action: (target, flag) for action, target, flag in targets})
+            seen_mirrored, action_targets = seen[key]
+            for action in legal_moves:
+                # Map the action when the state is the mirror of the one that was searched
+                searched_action = action if mirrored == seen_mirrored else mirror_move(action)
+                target, flag = action_targets[searched_action]
+                results.append((state, action, target, flag))
+        return results
+
+
+class TeacherPool:
+    """
+    TeacherPool computes MinimaxTeacher.targets in worker processes.
+
+    Batch number n always goes to worker n % workers, so every worker sees the same sequence of
+    batches (and builds the same tables) in every run, and seeded training stays reproducible.
+
+    Parameters:
+    - workers (int): Number of worker processes, each with its own MinimaxTeacher.
+    - teacher_options: Keyword arguments of the MinimaxTeacher of every worker.
+
+    Attributes:
+    - hits, misses, static_hits, evaluations (int): Counters of the workers' teachers, summed.
+
+    Methods:
+    - submit(batch, color): Starts computing the targets of a batch and returns a Future.
+    - collect(future): Waits for a Future returned by submit and returns the targets.
+    - close(): Shuts down the worker processes.
+    """
+
+    def __init__(self, workers, **teacher_options):
+        self.workers = workers
+        # One single-process executor per worker, so batches can be assigned to a worker
+        self.executors = [ProcessPoolExecutor(1, initializer=init_teacher_worker, initargs=(teacher_options,))
+                          for _ in range(workers)]
+        self.submitted = 0
+        self.counters = [(0, 0, 0, 0)] * workers
+
+    def submit(self, batch, color):
+        worker = self.submitted % self.workers
+        self.submitted += 1
+        future = self.executors[worker].submit(targets_worker, batch, color)
+        future.worker = worker
+        return future
+
+    def collect(self, future):
+        targets, counters = future.result()
+        self.counters[future.worker] = counters
+        return targets
+
+    @property
+    def hits(self):
+        return sum(counters[0] for counters in self.counters)
+
+    @property
+    def misses(self):
+        return sum(counters[1] for counters in self.counters)
+
+    @property
+    def static_hits(self):
+        return sum(counters[2] for counters in self.counters)
+
+    @property
+    def evaluations(self):
+        return sum(counters[3] for counters in self.counters)
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown()
+        self.executors = []
+
+
+worker_teacher = None  # MinimaxTeacher of a TeacherPool worker process
+
+
+def init_teacher_worker(teacher_options):
+    """
+    Creates the MinimaxTeacher of a worker process.
+    """
+    global worker_teacher
+    worker_teacher = MinimaxTeacher(**teacher_options)
+
+
+def targets_worker(batch, color):
+    """
+    Computes the targets of a batch in a worker and returns them with the teacher counters.
+    """
+    targets = worker_teacher.targets(batch, color)
+    counters = (worker_teacher.hits, worker_teacher.misses, worker_teacher.static_hits, worker_teacher.evaluations)
+    return targets, counters
@@ -0,0 +1,212 @@
+import sys
+import json
+import time
+import cProfile
+import pstats
+from contextlib import contextmanager
+from analytics import LogHistogram
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+'''
+Per-ply telemetry for matches and training.
+
+A Telemetry object is attached to a game with Game.set_telemetry, which passes it on to the
+players. It collects:
+- Move latency histograms per agent and game phase (p50/p95/p99).
+- Time spent per category: "move" (the whole move), "search" (Minimax/Alpha-Beta/MCTS),
+  "eval" (Minimax heuristic), "rollout" (MCTS simulations), "q_lookup" (Q-table reads when
+  choosing an action) and "render" (printing the board). Categories nest (e.g. eval runs inside
+  search), so they do not add up to the total time.
+- Peak resident memory of the process.
+
+Results can be exported as JSON or in the Prometheus text format.
+'''
+
+PHASES = (('opening', 14), ('middlegame', 28), ('endgame', 42))
+
+
+def game_phase(round_number):
+    """
+    Returns the phase of the game ('opening', 'middlegame' or 'endgame') for a round number.
+    """
+    for phase, last_round in PHASES:
+        if round_number <= last_round:
+            return phase
+    return PHASES[-1][0]
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident memory of the process in bytes, or None if it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Telemetry:
+    """
+    Telemetry collects per-ply latencies and the time spent per category.
+
+    Attributes:
+    - latencies (dict): LogHistogram of move latencies per (agent, phase).
+    - categories (dict): [calls, seconds] per category.
+
+    Methods:
+    - record_move(agent, round_number, seconds): Records the latency of a move.
+    - add(category, seconds): Adds time to a category.
+    - timer(category): Context manager that adds the time of its block to a category.
+    - to_dict(): Returns the telemetry as a dictionary.
+    - to_json(filename): Returns the telemetry as JSON, writing it to a file if given.
+    - to_prometheus(filename): Returns the telemetry in the Prometheus text format, writing it to a file if given.
+    - print_summary(): Prints the latencies and the time per category.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.categories = {}
+
+    def record_move(self, agent, round_number, seconds):
+        """
+        Records the latency of a move of an agent at the given round.
+        """
+        key = (agent, game_phase(round_number))
+        histogram = self.latencies.get(key)
+        if histogram is None:
+            histogram = self.latencies[key] = LogHistogram()
+        histogram.add(seconds)
+        self.add('move', seconds)
+
+    def add(self, category, seconds):
+        """
+        Adds time to a category.
+        """
+        totals = self.categories.get(category)
+        if totals is None:
+            totals = self.categories[category] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += seconds
+
+    @contextmanager
+    def timer(self, category):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(category, time.perf_counter() - start)
+
+    def agent_latencies(self):
+        """
+        Returns the move latency histograms per agent, merging all phases.
+        """
+        merged = {}
+        for (agent, _), histogram in self.latencies.items():
+            merged.setdefault(agent, LogHistogram()).merge(histogram)
+        return merged
+
+    def to_dict(self):
+        return {
+            "latency": {
+                agent: {
+                    "all": histogram.to_dict(),
+                    "phases": {phase: h.to_dict() for (a, phase), h in self.latencies.items() if a == agent},
+                }
+                for agent, histogram in self.agent_latencies().items()
+            },
+            "categories": {category: {"calls": calls, "seconds": seconds}
+                           for category, (calls, seconds) in self.categories.items()},
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    def to_json(self, filename=None):
+        text = json.dumps(self.to_dict(), indent=2)
+        if filename is not None:
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write(text)
+        return text
+
+    def to_prometheus(self, filename=None):
+        lines = [
+            "# HELP connect4_move_latency_seconds Time an agent takes to choose a move.",
+            "# TYPE connect4_move_latency_seconds summary",
+        ]
+        for (agent, phase), histogram in sorted(self.latencies.items()):
+            labels = f'agent="{agent}",phase="{phase}"'
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'connect4_move_latency_seconds{{{labels},quantile="{quantile}"}} {histogram.quantile(quantile):.9g}')
+            lines.append(f"connect4_move_latency_seconds_sum{{{labels}}} {histogram.total:.9g}")
+            lines.append(f"connect4_move_latency_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP connect4_time_seconds_total Time spent per category.")
+        lines.append("# TYPE connect4_time_seconds_total counter")
+        for category, (_, seconds) in sorted(self.categories.items()):
+            lines.append(f'connect4_time_seconds_total{{category="{category}"}} {seconds:.9g}')
+        lines.append("# HELP connect4_calls_total Number of timed calls per category.")
+        lines.append("# TYPE connect4_calls_total counter")
+        for category, (calls, _) in sorted(self.categories.items()):
+            lines.append(f'connect4_calls_total{{category="{category}"}} {calls}')
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines.append("# HELP connect4_peak_rss_bytes Peak resident memory of the process.")
+            lines.append("# TYPE connect4_peak_rss_bytes gauge")
+            lines.append(f"connect4_peak_rss_bytes {peak}")
+
+        text = "\n".join(lines) + "\n"
+        if filename is not None:
+            with open(filename, 'w', encoding='utf-8') as file:
+                file.write(text)
+        return text
+
+    def print_summary(self):
+        """
+        Prints the move latencies per agent and phase and the time per category.
+        """
+        print("\n{:<20} {:<12} {:<8} {:<12} {:<12} {:<12}".format("Agent", "Phase", "Moves", "p50 (s)", "p95 (s)", "p99 (s)"))
+        print("-" * 80)
+        phases = [phase for phase, _ in PHASES]
+        for (agent, phase), histogram in sorted(self.latencies.items(), key=lambda item: (item[0][0], phases.index(item[0][1]))):
+            print("{:<20} {:<12} {:<8} {:<12.6f} {:<12.6f} {:<12.6f}".format(
+                agent, phase, histogram.count, histogram.quantile(0.50), histogram.quantile(0.95), histogram.quantile(0.99)))
+
+        print("\n{:<12} {:<10} {:<12}".format("Category", "Calls", "Seconds"))
+        print("-" * 36)
+        for category, (calls, seconds) in sorted(self.categories.items()):
+            print("{:<12} {:<10} {:<12.4f}".format(category, calls, seconds))
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            print(f"\nPeak RSS: {peak / (1 << 20):.1f} MiB")
+
+
+def profile_game(game, filename=None, sort='cumulative', limit=25):
+    """
+    Plays a single game under cProfile and prints the most expensive functions.
+
+    Args:
+    game: Game to play (a new game is started).
+    filename: Optional file where the raw profile is saved (readable with pstats or snakeviz).
+    sort: pstats sort key.
+    limit: Number of functions printed.
+
+    Returns:
+    The pstats.Stats of the game.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    game.new_game()
+    while not game.finished:
+        game.next_move()
+    profiler.disable()
+
+    if filename is not None:
+        profiler.dump_stats(filename)
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(sort).print_stats(limit)
+    return stats